@@ -7,4 +7,4 @@ class AccountsConfig(AppConfig):
     verbose_name = 'Accounts'
     
     def ready(self):
-        pass
\ No newline at end of file
+        import apps.accounts.signals
\ No newline at end of file
@@ -30,6 +30,8 @@ class User(AbstractUser):
     
     # Profile & Preferences
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Resized copies of `avatar`, see apps.core.images
+    avatar_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True, null=True, max_length=500)
     
     # Status Flags
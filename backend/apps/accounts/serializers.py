@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
+from apps.core.serializers import ImageDerivativesField
 from .models import User, Address, UserActivity
 
 
@@ -55,12 +56,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
     # Explicit types for schema generation
     full_name = serializers.CharField(read_only=True)
     has_complete_profile = serializers.BooleanField(read_only=True)
+    avatar_srcset = ImageDerivativesField('avatar')
 
     class Meta:
         model = User
         fields = (
             'id', 'email', 'first_name', 'last_name', 'full_name',
-            'phone_number', 'date_of_birth', 'avatar', 'bio',
+            'phone_number', 'date_of_birth', 'avatar', 'avatar_srcset', 'bio',
             'address_line1', 'address_line2', 'city', 'state',
             'country', 'postal_code', 'newsletter_subscription',
             'marketing_emails', 'sms_notifications', 'is_email_verified',
@@ -1,5 +1,6 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from apps.core import images
 from .models import User, UserActivity
 
 @receiver(post_save, sender=User)
@@ -9,4 +10,9 @@ def create_user_activity(sender, instance, created, **kwargs):
             user=instance,
             activity_type='account_created',
             description='User account was created'
-        )
\ No newline at end of file
+        )
+
+@receiver(post_save, sender=User)
+def queue_avatar_derivatives(sender, instance, update_fields=None, **kwargs):
+    """Render avatar thumbnails of a new upload in the background"""
+    images.queue_derivatives(instance, 'avatar', update_fields)
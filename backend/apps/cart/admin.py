@@ -14,10 +14,23 @@ class CartItemInline(admin.TabularInline):
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'session_key', 'total_items', 'subtotal', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['user']
     search_fields = ['user__email', 'session_key']
     readonly_fields = ['created_at', 'updated_at', 'subtotal', 'total_items']
     inlines = [CartItemInline]
 
+    def get_queryset(self, request):
+        # Totals for the whole page in the list query itself
+        return Cart.objects.with_totals(super().get_queryset(request))
+
+    @admin.display(description='Total items', ordering='items_quantity')
+    def total_items(self, obj):
+        return obj.total_items
+
+    @admin.display(description='Subtotal', ordering='items_subtotal')
+    def subtotal(self, obj):
+        return obj.subtotal
+
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'unit_price', 'total_price', 'added_at']
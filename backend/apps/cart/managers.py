@@ -0,0 +1,18 @@
+from django.db import models
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+class CartManager(models.Manager):
+    def with_totals(self, queryset=None):
+        """Annotate item quantity and subtotal with one grouped aggregate"""
+        if queryset is None:
+            queryset = self.all()
+        return queryset.annotate(
+            items_quantity=Coalesce(Sum('items__quantity'), 0),
+            items_subtotal=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price')),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
@@ -3,8 +3,10 @@ from django.db import models
 # Create your models here.
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils.functional import cached_property
 from apps.accounts.models import User
 from apps.products.models import Product
+from .managers import CartManager
 
 class Cart(models.Model):
     user = models.OneToOneField(
@@ -17,6 +19,7 @@ class Cart(models.Model):
     session_key = models.CharField(max_length=40, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = CartManager()
 
     class Meta:
         ordering = ['-created_at']
@@ -26,13 +29,28 @@ class Cart(models.Model):
             return f"Cart for {self.user.email}"
         return f"Anonymous Cart ({self.session_key})"
 
+    @cached_property
+    def totals(self):
+        """(item quantity, subtotal), computed once per instance"""
+        # Prefer the values from CartManager.with_totals()
+        if hasattr(self, 'items_quantity'):
+            return self.items_quantity, self.items_subtotal
+        # Then the prefetched items, which the cart endpoints load anyway
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            items = self.items.all()
+            return sum(item.quantity for item in items), sum(item.total_price for item in items)
+        cart = Cart.objects.with_totals(Cart.objects.filter(pk=self.pk)).values(
+            'items_quantity', 'items_subtotal'
+        ).get()
+        return cart['items_quantity'], cart['items_subtotal']
+
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals[0]
 
     @property
     def subtotal(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.totals[1]
 
     @property
     def total_price(self):
@@ -42,6 +60,8 @@ class Cart(models.Model):
     def clear(self):
         """Clear all items from the cart"""
         self.items.all().delete()
+        getattr(self, '_prefetched_objects_cache', {}).pop('items', None)
+        self.__dict__.pop('totals', None)
 
     def merge_with_user_cart(self, user):
         """Merge anonymous cart with user cart after login"""
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
+from apps.core.serializers import SparseFieldsetMixin
 from apps.products.serializers import ProductListSerializer
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
     unit_price = serializers.ReadOnlyField()
     total_price = serializers.ReadOnlyField()
@@ -51,7 +52,7 @@ class CartItemSerializer(serializers.ModelSerializer):
             )
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.ReadOnlyField()
     subtotal = serializers.ReadOnlyField()
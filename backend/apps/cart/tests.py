@@ -1,3 +1,71 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.accounts.models import User
+from apps.products.models import Product, ProductImage
+from .models import Cart, CartItem
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com', password='pw', first_name='S', last_name='S')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def add_items(self, count):
+        for number in range(count):
+            product = Product.objects.create(
+                name=f'Mug {self.cart.items.count()}', description='Mug',
+                price=Decimal('4.50') + number, quantity=100, status='published'
+            )
+            ProductImage.objects.create(product=product, image='products/mug.jpg', is_primary=True)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=number + 1)
+
+    def get_cart(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart:cart-detail', args=[self.cart.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_cart_get_costs_constant_queries(self):
+        self.add_items(1)
+        _, one_item = self.get_cart()
+        self.add_items(5)
+        response, six_items = self.get_cart()
+
+        self.assertEqual(six_items, one_item)
+        self.assertEqual(len(response.data['items']), 6)
+        self.assertEqual(response.data['total_items'], 1 + 1 + 2 + 3 + 4 + 5)
+        expected = sum(Decimal(item['total_price']) for item in response.data['items'])
+        self.assertEqual(Decimal(str(response.data['subtotal'])), expected)
+
+    def test_totals_from_annotation_prefetch_and_aggregate_agree(self):
+        self.add_items(3)
+        annotated = Cart.objects.with_totals().get(pk=self.cart.pk)
+        prefetched = Cart.objects.prefetch_related('items__product').get(pk=self.cart.pk)
+        plain = Cart.objects.get(pk=self.cart.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.totals, (6, Decimal('4.50') + Decimal('11.00') + Decimal('19.50')))
+            self.assertEqual(prefetched.totals, annotated.totals)
+        with self.assertNumQueries(1):
+            self.assertEqual((plain.total_items, plain.subtotal, plain.total_price), (6, Decimal('35.00'), Decimal('35.00')))
+
+        plain.clear()
+        self.assertEqual(plain.totals, (0, 0))
+
+    def test_admin_list_annotates_totals(self):
+        self.add_items(2)
+        other = Cart.objects.create(session_key='anonymous')
+        CartItem.objects.create(cart=other, product=Product.objects.first(), quantity=4)
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw', first_name='A', last_name='A')
+        self.client.force_login(admin)
 
-# Create your tests here.
+        response = self.client.get(reverse('admin:cart_cart_changelist'), {'o': '4'})
+        self.assertEqual(response.status_code, 200)
+        carts = list(response.context['cl'].result_list)
+        self.assertEqual([cart.items_quantity for cart in carts], [3, 4])
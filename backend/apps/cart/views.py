@@ -6,23 +6,42 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.exceptions import NotFound, ValidationError
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils import timezone
+from apps.core.serializers import is_field_requested
+from apps.products.models import primary_image_prefetch
 from .models import Cart, CartItem
 from .serializers import (
     CartSerializer, CartItemSerializer, 
     AddToCartSerializer, UpdateCartItemSerializer
 )
 
+def cart_items_prefetch(request=None):
+    """Prefetch cart items with their products and primary images in two queries"""
+    prefetches = [
+        Prefetch(
+            'items',
+            queryset=CartItem.objects.select_related('product__category', 'product__brand')
+        ),
+    ]
+    # Skip the images when ?fields= leaves them out
+    if is_field_requested(request, 'items.product.primary_image'):
+        prefetches.append(primary_image_prefetch('items__product__images'))
+    return prefetches
+
+
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user).prefetch_related('items__product')
+        return Cart.objects.filter(user=self.request.user).prefetch_related(*cart_items_prefetch(self.request))
 
     def get_object(self):
         # Get or create cart for authenticated user
         cart, created = Cart.objects.get_or_create(user=self.request.user)
+        if self.request.method == 'GET':
+            prefetch_related_objects([cart], *cart_items_prefetch(self.request))
         return cart
 
     @action(detail=False, methods=['get', 'post', 'put', 'delete'], permission_classes=[AllowAny])
@@ -38,6 +57,7 @@ class CartViewSet(viewsets.ModelViewSet):
         cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
 
         if request.method == 'GET':
+            prefetch_related_objects([cart], *cart_items_prefetch(request))
             serializer = self.get_serializer(cart)
             return Response(serializer.data)
 
@@ -169,7 +189,12 @@ class CartItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return CartItem.objects.filter(cart__user=self.request.user).select_related('product')
+        queryset = CartItem.objects.filter(cart__user=self.request.user).select_related(
+            'product__category', 'product__brand'
+        )
+        if is_field_requested(self.request, 'product.primary_image'):
+            queryset = queryset.prefetch_related(primary_image_prefetch('product__images'))
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['update', 'partial_update']:
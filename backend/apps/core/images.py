@@ -0,0 +1,195 @@
+"""
+Resized WebP/JPEG derivatives of uploaded images.
+
+Each image field listed in DERIVATIVE_SPECS has a JSON companion column,
+`<field>_derivatives`, recording the file the derivatives were made from and
+their storage paths:
+
+    {'source': 'products/shoe.jpg',
+     'files': {'webp': {'150x150': 'products/derivatives/shoe/150x150.webp',
+                        '640w': 'products/derivatives/shoe/640w.webp'},
+               'jpeg': {...}}}
+
+Saving a new file queues the Celery task that renders them; until it has run
+(or when the file is replaced) derivative_urls() returns None and clients use
+the original.
+"""
+import io
+import logging
+import posixpath
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.fields.json import KeyTextTransform
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# 'app_label.Model.field' -> fixed-size thumbnails ((width, height), cropped
+# to fill unless crop is False) and responsive widths. Widths larger than the
+# original are skipped.
+DERIVATIVE_SPECS = {
+    'products.ProductImage.image': {
+        'thumbnails': [(150, 150), (300, 300)],
+        'widths': [320, 640, 1024, 1600],
+        'crop': True,
+    },
+    'products.Category.image': {
+        'thumbnails': [(150, 150), (300, 300)],
+        'widths': [640, 1280],
+        'crop': True,
+    },
+    'products.Brand.logo': {
+        'thumbnails': [(100, 100), (200, 200)],
+        'widths': [],
+        'crop': False,
+    },
+    'reviews.ReviewImage.image': {
+        'thumbnails': [(150, 150)],
+        'widths': [640, 1280],
+        'crop': True,
+    },
+    'accounts.User.avatar': {
+        'thumbnails': [(64, 64), (128, 128), (256, 256)],
+        'widths': [],
+        'crop': True,
+    },
+}
+
+# format -> (extension, Pillow save options)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Sent with the instance after its derivatives are stored, for cache invalidation
+derivatives_generated = Signal()
+
+
+def derivatives_field(field_name):
+    return f'{field_name}_derivatives'
+
+
+def get_spec(label):
+    """Return (model, field name, spec) for a DERIVATIVE_SPECS label"""
+    model_label, field_name = label.rsplit('.', 1)
+    return apps.get_model(model_label), field_name, DERIVATIVE_SPECS[label]
+
+
+def derivative_urls(name, derivatives, storage):
+    """{format: {descriptor: url}} for file `name`, or None until its derivatives exist"""
+    if not name or not derivatives or derivatives.get('source') != name:
+        return None
+    return {
+        format: {descriptor: storage.url(path) for descriptor, path in paths.items()}
+        for format, paths in derivatives['files'].items()
+    }
+
+
+def pending(label, regenerate=False):
+    """Primary keys of `label` instances with a file but no current derivatives"""
+    model, field_name, _ = get_spec(label)
+    queryset = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+    if not regenerate:
+        queryset = queryset.annotate(
+            derivatives_source=KeyTextTransform('source', derivatives_field(field_name))
+        ).filter(Q(derivatives_source__isnull=True) | ~Q(derivatives_source=F(field_name)))
+    return queryset.order_by('pk').values_list('pk', flat=True)
+
+
+def queue_derivatives(instance, field_name, update_fields=None):
+    """
+    post_save hook: render derivatives once the transaction commits, if the
+    file changed since they were last made.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+    file = getattr(instance, field_name)
+    derivatives = getattr(instance, derivatives_field(field_name))
+    if not file or (derivatives and derivatives.get('source') == file.name):
+        return
+    label = f'{instance._meta.label}.{field_name}'
+    transaction.on_commit(lambda: enqueue(label, [instance.pk]))
+
+
+def enqueue(label, pks):
+    from .tasks import generate_image_derivatives
+
+    try:
+        generate_image_derivatives.delay(label, pks)
+    except Exception:
+        # The upload itself has succeeded; the backfill command catches up
+        logger.exception('Could not queue image derivatives for %s %s', label, pks)
+
+
+def render(image, spec):
+    """Yield (descriptor, resized image) for `spec`"""
+    resize = ImageOps.fit if spec['crop'] else ImageOps.contain
+    for width, height in spec['thumbnails']:
+        yield f'{width}x{height}', resize(image, (width, height), Image.LANCZOS)
+    for width in spec['widths']:
+        if width < image.width:
+            height = round(image.height * width / image.width)
+            yield f'{width}w', image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, format):
+    _, options = FORMATS[format]
+    if format == 'jpeg' and image.mode != 'RGB':
+        # No alpha channel in JPEG; flatten onto white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def generate(instance, field_name, spec):
+    """Render and store the derivatives of one instance's file; return the record"""
+    file = getattr(instance, field_name)
+    storage = file.storage
+    directory, filename = posixpath.split(file.name)
+    stem = posixpath.splitext(filename)[0]
+    prefix = posixpath.join(directory, 'derivatives', stem)
+
+    with file.open('rb'):
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        image.load()
+
+    files = {format: {} for format in FORMATS}
+    for descriptor, resized in render(image, spec):
+        for format, (extension, _) in FORMATS.items():
+            path = f'{prefix}/{descriptor}.{extension}'
+            # Paths are deterministic, so a rerun overwrites instead of piling up copies
+            storage.delete(path)
+            files[format][descriptor] = storage.save(path, ContentFile(encode(resized, format)))
+    return {'source': file.name, 'files': files}
+
+
+def process(label, pks):
+    """Generate derivatives for the instances of `label` with the given pks"""
+    model, field_name, spec = get_spec(label)
+    target = derivatives_field(field_name)
+    for instance in model.objects.filter(pk__in=pks):
+        if not getattr(instance, field_name):
+            continue
+        try:
+            derivatives = generate(instance, field_name, spec)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Missing or unreadable file; one bad upload shouldn't fail the batch
+            logger.exception('Could not generate derivatives for %s %s', label, instance.pk)
+            continue
+        # Only record them if the file wasn't replaced in the meantime
+        updated = model.objects.filter(
+            pk=instance.pk, **{field_name: derivatives['source']}
+        ).update(**{target: derivatives})
+        if updated:
+            setattr(instance, target, derivatives)
+            derivatives_generated.send(sender=model, instance=instance, field_name=field_name)
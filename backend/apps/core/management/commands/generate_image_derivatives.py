@@ -0,0 +1,69 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.core import images
+from apps.core.tasks import generate_image_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate resized WebP/JPEG derivatives for existing images, by queueing '
+        'Celery tasks or in a local pool of worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'labels',
+            nargs='*',
+            metavar='app_label.Model.field',
+            help=f"Image fields to process (default: all of {', '.join(images.DERIVATIVE_SPECS)})",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate derivatives that are already up to date',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Images per task (default: 50)',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=0,
+            help='Render in this many local processes instead of queueing Celery tasks',
+        )
+
+    def handle(self, *args, **options):
+        labels = options['labels'] or list(images.DERIVATIVE_SPECS)
+        unknown = set(labels) - set(images.DERIVATIVE_SPECS)
+        if unknown:
+            raise CommandError(f"Unknown image fields: {', '.join(sorted(unknown))}")
+
+        jobs = []
+        for label in labels:
+            pks = images.pending(label, regenerate=options['all']).iterator()
+            while batch := list(islice(pks, options['batch_size'])):
+                jobs.append((label, batch))
+        count = sum(len(pks) for _, pks in jobs)
+
+        if options['processes']:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['processes'], mp_context=multiprocessing.get_context('fork')
+            ) as pool:
+                for future in as_completed([pool.submit(images.process, *job) for job in jobs]):
+                    future.result()
+            self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {count} images'))
+            return
+
+        for label, pks in jobs:
+            generate_image_derivatives.delay(label, pks)
+        self.stdout.write(self.style.SUCCESS(f'Queued {len(jobs)} tasks for {count} images'))
@@ -0,0 +1,158 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    # Keep full precision; DjangoJSONEncoder truncates datetimes to milliseconds
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Keyset (cursor) pagination over the queryset ordering plus the primary key.
+
+    Opt in with ?cursor= (empty for the first page). Each page is then
+    selected with a WHERE clause on the sort key of the last row of the
+    previous page instead of an OFFSET, and no COUNT(*) is run, so deep pages
+    cost the same as the first one; responses carry only `next` and
+    `results`. Without ?cursor= the response keeps the page-number shape
+    (count, next, previous, results), as do orderings that cannot be used as
+    a keyset (annotations or related fields). Pages may hold model instances
+    or values() dicts.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(queryset)
+        self.use_page_numbers = ordering is None or self.cursor_query_param not in request.query_params
+        if self.use_page_numbers:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.ordering = ordering
+        queryset = queryset.order_by(*ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+
+        # Fetch one extra row to know whether there is a next page
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page_results = results[:page_size]
+        return self.page_results
+
+    def get_paginated_response(self, data):
+        if self.use_page_numbers:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['description'] = 'Absent with ?cursor='
+        return response_schema
+
+    def get_next_link(self):
+        if self.use_page_numbers:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page_results[-1]
+        position = [self.get_value(last, field.lstrip('-')) for field in self.ordering]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(position)
+        )
+
+    def get_value(self, row, name):
+        if isinstance(row, dict):
+            return row[self.pk_name if name == 'pk' else name]
+        return getattr(row, name)
+
+    def get_ordering(self, queryset):
+        """Return the ordering with a primary key tie-breaker, or None if it can't be keyed"""
+        ordering = list(queryset.query.order_by) or list(queryset.query.get_meta().ordering)
+        if not ordering:
+            return None
+
+        opts = queryset.model._meta
+        self.pk_name = opts.pk.attname
+        for field in ordering:
+            if not isinstance(field, str):
+                return None
+            name = field.lstrip('-')
+            if name == 'pk':
+                continue
+            try:
+                model_field = opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if model_field.is_relation or model_field.null:
+                return None
+
+        if not any(field.lstrip('-') in ('pk', opts.pk.name) for field in ordering):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    def get_keyset_filter(self, ordering, position):
+        """
+        Rows strictly after `position`, e.g. for ('-created_at', '-pk'):
+        created_at <= v1 AND (created_at < v1 OR (created_at = v1 AND pk < v2))
+        """
+        condition = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            if condition is not None:
+                after |= Q(**{name: value}) & condition
+            condition = after
+
+        # Redundant bound on the leading column so the index range scan starts at the cursor
+        name = ordering[0].lstrip('-')
+        lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{name}__{lookup}': position[0]}) & condition
+
+    def encode_cursor(self, position):
+        payload = json.dumps({'o': self.ordering, 'p': position}, default=_encode_value)
+        return urlsafe_b64encode(payload.encode()).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            ordering, position = payload['o'], payload['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor is only valid for the ordering it was issued for
+        if ordering != self.ordering or len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
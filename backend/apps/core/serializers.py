@@ -0,0 +1,102 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from .images import derivative_urls, derivatives_field
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def requested_fields(request, param, path=''):
+    """
+    Names directly below `path` listed in the comma-separated ?<param>=.
+
+    E.g. ?fields=id,product.name gives {'id', 'product'} for the root and
+    {'name'} for 'product'. Returns None when nothing below `path` is listed,
+    meaning "no restriction".
+    """
+    value = request.query_params.get(param) if request is not None else None
+    if not value:
+        return None
+
+    prefix = f'{path}.' if path else ''
+    names = set()
+    for name in value.split(','):
+        name = name.strip()
+        if name.startswith(prefix) and len(name) > len(prefix):
+            names.add(name[len(prefix):].split('.', 1)[0])
+    return names or None
+
+
+def is_field_requested(request, path):
+    """Whether the field at dotted `path` is part of the ?fields= selection"""
+    parts = path.split('.')
+    for depth, name in enumerate(parts):
+        names = requested_fields(request, FIELDS_PARAM, '.'.join(parts[:depth]))
+        if names is not None and name not in names:
+            return False
+    return True
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for the ?fields= and ?expand= query parameters.
+
+    `?fields=id,name,product.price` limits the output to those fields; a
+    dotted name selects fields of a nested serializer, which otherwise keeps
+    all of its own. `?expand=category` swaps a field for, or adds, the nested
+    serializer declared in `expandable_fields`. Fields in
+    `always_included_fields` are never dropped. Only read requests are
+    affected, so writable fields can't be hidden from validation.
+    """
+    # {name: (serializer class, kwargs)}
+    expandable_fields = {}
+    always_included_fields = ['id']
+
+    @property
+    def field_path(self):
+        """Dotted path of this serializer from the root one, e.g. 'items.product'"""
+        names = []
+        node = self
+        while node.parent is not None:
+            # List children are bound with an empty field name
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        path = self.field_path
+
+        expanded = (requested_fields(request, EXPAND_PARAM, path) or set()) & set(self.expandable_fields)
+        for name in expanded:
+            serializer_class, kwargs = self.expandable_fields[name]
+            fields[name] = serializer_class(read_only=True, **kwargs)
+
+        selected = requested_fields(request, FIELDS_PARAM, path)
+        if selected is None:
+            return fields
+        selected.update(self.always_included_fields, expanded)
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class ImageDerivativesField(serializers.Field):
+    """
+    Read-only {format: {descriptor: url}} map of an image's resized
+    derivatives, e.g. {'webp': {'150x150': ..., '640w': ...}, 'jpeg': {...}},
+    or None until they have been generated.
+    """
+
+    def __init__(self, image_field='image', **kwargs):
+        self.image_field = image_field
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        file = getattr(instance, self.image_field)
+        derivatives = getattr(instance, derivatives_field(self.image_field))
+        return derivative_urls(file.name, derivatives, file.storage)
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from . import images
+
+
+@shared_task(ignore_result=True)
+def generate_image_derivatives(label, pks):
+    """Render WebP/JPEG derivatives for the `label` image of the given instances"""
+    images.process(label, pks)
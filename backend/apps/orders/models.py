@@ -106,6 +106,9 @@ class Order(models.Model):
             models.Index(fields=['order_number']),
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['status', 'created_at']),
+            # Keyset pagination orderings
+            models.Index(fields=['-created_at', '-id'], name='order_created_id'),
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_id'),
         ]
 
     def __str__(self):
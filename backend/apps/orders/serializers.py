@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderStatusHistory, ShippingMethod
+from apps.core.serializers import SparseFieldsetMixin
 from apps.products.serializers import ProductListSerializer
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
     product_name = serializers.ReadOnlyField()
     product_sku = serializers.ReadOnlyField()
@@ -37,7 +38,7 @@ class ShippingMethodSerializer(serializers.ModelSerializer):
         model = ShippingMethod
         fields = '__all__'
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status_history = OrderStatusHistorySerializer(many=True, read_only=True)
     item_count = serializers.ReadOnlyField()
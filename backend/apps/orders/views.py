@@ -6,6 +6,9 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from apps.core.pagination import KeysetPagination
+from apps.core.serializers import is_field_requested
+from apps.products.models import primary_image_prefetch
 from .models import Order, OrderItem, OrderStatusHistory, ShippingMethod
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderUpdateSerializer,
@@ -15,6 +18,7 @@ from .serializers import (
 
 class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'payment_status']
     search_fields = ['order_number', 'customer_email', 'shipping_first_name', 'shipping_last_name']
@@ -22,9 +26,15 @@ class OrderViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_queryset(self):
+        queryset = Order.objects.prefetch_related('items__product')
+        # Skip prefetches for fields left out of ?fields=
+        if is_field_requested(self.request, 'items.product.primary_image'):
+            queryset = queryset.prefetch_related(primary_image_prefetch('items__product__images'))
+        if is_field_requested(self.request, 'status_history'):
+            queryset = queryset.prefetch_related('status_history')
         if self.request.user.is_staff:
-            return Order.objects.all().prefetch_related('items', 'status_history')
-        return Order.objects.filter(user=self.request.user).prefetch_related('items', 'status_history')
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -168,9 +178,12 @@ class OrderItemViewSet(viewsets.ModelViewSet):
     serializer_class = OrderItemSerializer
 
     def get_queryset(self):
+        queryset = OrderItem.objects.select_related('order', 'product')
+        if is_field_requested(self.request, 'product.primary_image'):
+            queryset = queryset.prefetch_related(primary_image_prefetch('product__images'))
         if self.request.user.is_staff:
-            return OrderItem.objects.all().select_related('order', 'product')
-        return OrderItem.objects.filter(order__user=self.request.user).select_related('order', 'product')
+            return queryset
+        return queryset.filter(order__user=self.request.user)
 
     def perform_destroy(self, instance):
         # Check if order can be modified
@@ -189,7 +202,10 @@ class ShippingMethodViewSet(viewsets.ReadOnlyModelViewSet):
 class AdminOrderViewSet(viewsets.ModelViewSet):
     """Admin-only viewset for order management"""
     permission_classes = [IsAdminUser]
-    queryset = Order.objects.all().prefetch_related('items', 'status_history')
+    pagination_class = KeysetPagination
+    queryset = Order.objects.prefetch_related(
+        'items__product', primary_image_prefetch('items__product__images'), 'status_history'
+    )
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'payment_status', 'user']
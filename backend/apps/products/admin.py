@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Category, Brand, Product, ProductImage
+from .models import (
+    Category, Brand, LowStockProduct, Product, ProductImage, ProductViewCount, StockAlert
+)
 
 
 @admin.register(Category)
@@ -10,6 +12,13 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        return Category.objects.with_products_count(super().get_queryset(request))
+
+    @admin.display(description='Products count', ordering='published_products_count')
+    def products_count(self, obj):
+        return obj.published_products_count
+
 
 @admin.register(Brand)
 class BrandAdmin(admin.ModelAdmin):
@@ -19,6 +28,13 @@ class BrandAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        return Brand.objects.with_products_count(super().get_queryset(request))
+
+    @admin.display(description='Products count', ordering='published_products_count')
+    def products_count(self, obj):
+        return obj.published_products_count
+
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
@@ -35,7 +51,11 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['status', 'is_featured', 'is_bestseller', 'category', 'brand', 'created_at']
     search_fields = ['name', 'slug', 'sku', 'description']
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ['created_at', 'updated_at', 'published_at', 'average_rating', 'review_count']
+    # is_bestseller is maintained by apps.products.flags
+    readonly_fields = [
+        'created_at', 'updated_at', 'published_at', 'is_bestseller', 'average_rating', 'review_count',
+        'popularity',
+    ]
     inlines = [ProductImageInline]
     
     fieldsets = (
@@ -61,7 +81,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('meta_title', 'meta_description')
         }),
         ('Statistics', {
-            'fields': ('average_rating', 'review_count', 'created_at', 'updated_at')
+            'fields': ('average_rating', 'review_count', 'popularity', 'created_at', 'updated_at')
         }),
     )
 
@@ -70,3 +90,43 @@ class ProductAdmin(admin.ModelAdmin):
     in_stock.boolean = True
 
 
+@admin.register(LowStockProduct)
+class LowStockProductAdmin(admin.ModelAdmin):
+    """Restocking worklist, read through the product_low_stock partial index"""
+    list_display = ['name', 'sku', 'category', 'brand', 'quantity', 'low_stock_threshold']
+    list_display_links = ['name']
+    list_editable = ['quantity']
+    list_select_related = ['category', 'brand']
+    search_fields = ['name', 'sku']
+    ordering = ['quantity', 'id']
+
+    def get_queryset(self, request):
+        return LowStockProduct.objects.low_stock()
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ['product', 'level', 'quantity', 'created_at', 'notified_at']
+    list_filter = ['level', 'created_at']
+    list_select_related = ['product']
+    search_fields = ['product__name', 'product__sku']
+    readonly_fields = ['product', 'level', 'quantity', 'created_at', 'notified_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ProductViewCount)
+class ProductViewCountAdmin(admin.ModelAdmin):
+    """Daily product views, written by apps.products.popularity"""
+    list_display = ['product', 'date', 'views']
+    list_select_related = ['product']
+    date_hierarchy = 'date'
+    search_fields = ['product__name', 'product__sku']
+    readonly_fields = ['product', 'date', 'views']
+
+    def has_add_permission(self, request):
+        return False
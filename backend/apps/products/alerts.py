@@ -0,0 +1,88 @@
+"""
+Low and out-of-stock alerts.
+
+A product alerts when a save or stock update moves it to a worse stock level
+(in stock -> low stock -> out of stock), judged from its old and new
+quantity. Each product alerts at most once per level within ALERT_WINDOW, so
+a product bouncing around its threshold doesn't repeat itself. Alerts are
+stored as StockAlert rows and mailed to staff in one digest by the
+send_stock_alert_digest task, which runs DIGEST_DELAY after the first alert
+of a batch.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK = 'low_stock'
+OUT_OF_STOCK = 'out_of_stock'
+# Stock levels from best to worst; None is in stock
+LEVELS = [None, LOW_STOCK, OUT_OF_STOCK]
+
+ALERT_WINDOW = 60 * 60 * 6
+DIGEST_DELAY = 60 * 5
+
+ALERT_KEY = 'stock-alert:{}:{}'
+DIGEST_KEY = 'stock-alert:digest-scheduled'
+
+
+def stock_level(quantity, low_stock_threshold, track_quantity):
+    if not track_quantity:
+        return None
+    if quantity <= 0:
+        return OUT_OF_STOCK
+    if quantity <= low_stock_threshold:
+        return LOW_STOCK
+    return None
+
+
+def record_transitions(products):
+    """
+    Alert for products that dropped to a worse stock level.
+
+    `products` are dicts with id, quantity, previous_quantity,
+    low_stock_threshold and track_quantity, as returned by
+    ProductManager.apply_stock_updates(). Alerts are recorded once the
+    current transaction commits, so rolled back changes never alert.
+    """
+    alerts = []
+    for product in products:
+        level = stock_level(product['quantity'], product['low_stock_threshold'], product['track_quantity'])
+        previous = stock_level(
+            product['previous_quantity'], product['low_stock_threshold'], product['track_quantity']
+        )
+        if LEVELS.index(level) > LEVELS.index(previous):
+            alerts.append((product['id'], level, product['quantity']))
+    if alerts:
+        transaction.on_commit(lambda: create_alerts(alerts))
+
+
+def create_alerts(alerts):
+    from .models import StockAlert
+
+    # cache.add() is atomic, so concurrent writers can't both alert
+    alerts = [
+        StockAlert(product_id=product_id, level=level, quantity=quantity)
+        for product_id, level, quantity in alerts
+        if cache.add(ALERT_KEY.format(product_id, level), True, ALERT_WINDOW)
+    ]
+    if not alerts:
+        return
+    StockAlert.objects.bulk_create(alerts)
+    schedule_digest()
+
+
+def schedule_digest():
+    """Queue one digest for the alerts raised in the next DIGEST_DELAY seconds"""
+    from .tasks import send_stock_alert_digest
+
+    if not cache.add(DIGEST_KEY, True, DIGEST_DELAY):
+        return
+    try:
+        send_stock_alert_digest.apply_async(countdown=DIGEST_DELAY)
+    except Exception:
+        # Unsent alerts are picked up by the next digest
+        cache.delete(DIGEST_KEY)
+        logger.exception('Could not queue the stock alert digest')
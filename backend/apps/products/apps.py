@@ -6,5 +6,5 @@ class ProductsConfig(AppConfig):
     name = 'apps.products'
     verbose_name ='Products'
 
-   # def ready(self):
-       # import apps.products.signals
\ No newline at end of file
+    def ready(self):
+        import apps.products.signals
@@ -0,0 +1,194 @@
+"""
+Versioned response cache for the public catalog endpoints.
+
+Every cached response records the version of each scope it was built from,
+e.g. 'products' (which products a list contains), 'product:12',
+'category:3'. Signals bump the versions of the scopes a change touches, so a
+cached response is rebuilt only when something it depends on has changed;
+nothing is deleted or flushed.
+
+The same versions give every cached response its ETag and Last-Modified
+validators, so conditional GETs are answered with a 304 without touching the
+database or rendering the body.
+
+Scopes that depend on the response data (the product a slug resolves to)
+are only known once it is built, so a change committed in between could
+leave old data stored under the new version. Every bump also bumps the
+CHANGES scope; it is read before a response is built and again after, and
+the response isn't cached if it moved.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version:{}'
+RESPONSE_KEY = 'catalog:response:{}:{}'
+RESPONSE_TIMEOUT = 60 * 15
+# Bumped with every change; never recorded in an entry
+CHANGES = 'changes'
+
+
+def get_versions(scopes):
+    """Return {scope: version}, creating versions that don't exist yet"""
+    keys = {VERSION_KEY.format(scope): scope for scope in set(scopes)}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # A fresh, never reused value, so an evicted version can't revive old entries
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump(*scopes):
+    """
+    Invalidate every cached response that depends on one of `scopes`, once
+    the current transaction commits. Bumping earlier would let a concurrent
+    read cache the old rows under the new version.
+    """
+    if scopes:
+        transaction.on_commit(lambda: set_versions(scopes))
+
+
+def set_versions(scopes):
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY.format(scope): version for scope in [*scopes, CHANGES]}, None)
+
+
+def get_versions_since(before, scopes):
+    """
+    `before` (versions read with CHANGES before the response was built) plus
+    the versions of `scopes`, or None if anything changed in between
+    """
+    after = get_versions([*scopes, CHANGES])
+    if after.pop(CHANGES) != before.get(CHANGES):
+        return None
+    versions = {**before, **after}
+    del versions[CHANGES]
+    return versions
+
+
+def product_scopes(products):
+    """Scopes a serialized product (or list of products) depends on"""
+    scopes = set()
+    for product in products:
+        scopes.add(f"product:{product['id']}")
+        for relation in ('category', 'brand'):
+            related = product.get(relation)
+            # An id, or a nested object with ?expand=
+            if isinstance(related, dict):
+                related = related['id']
+            if related:
+                scopes.add(f'{relation}:{related}')
+    return scopes
+
+
+def entry_key(name, host, params, **kwargs):
+    """Cache key from the view name, host, URL kwargs and (key, value) query parameters"""
+    query = urlencode(sorted(params))
+    signature = f'{host}|{sorted(kwargs.items())}|{query}'
+    return RESPONSE_KEY.format(name, hashlib.md5(signature.encode()).hexdigest())
+
+
+def response_key(name, request, **kwargs):
+    """Cache key for a request from the view name, host, URL kwargs and normalized query string"""
+    params = [
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ]
+    return entry_key(name, request.get_host(), params, **kwargs)
+
+
+def get_cached_entry(key):
+    """Return the cached {'data', 'versions'} for `key` if none of its dependencies changed"""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if get_versions(entry['versions']) != entry['versions']:
+        return None
+    return entry
+
+
+def get_cached_entries(keys):
+    """get_cached_entry() for many keys, with one read of the entries and one of their versions"""
+    entries = cache.get_many(keys)
+    current = get_versions({scope for entry in entries.values() for scope in entry['versions']})
+    return {
+        key: entry for key, entry in entries.items()
+        if all(current[scope] == version for scope, version in entry['versions'].items())
+    }
+
+
+def set_cached_entries(entries):
+    """Store {key: (data, versions)} in one write"""
+    cache.set_many(
+        {key: {'data': data, 'versions': versions} for key, (data, versions) in entries.items()},
+        RESPONSE_TIMEOUT
+    )
+
+
+def set_cached_entry(key, data, versions):
+    entry = {'data': data, 'versions': versions}
+    cache.set(key, entry, RESPONSE_TIMEOUT)
+    return entry
+
+
+def get_validators(request, key, versions):
+    """Strong ETag and Last-Modified (epoch seconds) for a response built from `versions`"""
+    signature = f'{key}|{request.accepted_media_type}|{sorted(versions.items())}'
+    etag = f'"{hashlib.md5(signature.encode()).hexdigest()}"'
+    # Versions are bump timestamps, so the newest one is the latest change
+    last_modified = max(versions.values(), default=0) // 10 ** 9 or None
+    return etag, last_modified
+
+
+def conditional_response(request, key, entry, response=None):
+    """
+    Return `response` (or a new one for the cached data) with validators set,
+    or a 304 if the client's copy is still current.
+    """
+    if response is None:
+        response = Response(entry['data'])
+    etag, last_modified = get_validators(request, key, entry['versions'])
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response
+    )
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses of a generic view.
+
+    `cache_scopes` are collection scopes read before the response is built;
+    `get_cache_scopes()` adds scopes derived from the response data, read
+    after it with get_versions_since().
+    """
+    cache_scopes = ()
+
+    def get_cache_scopes(self, data):
+        return set()
+
+    def get(self, request, *args, **kwargs):
+        key = response_key(type(self).__name__, request, **kwargs)
+        entry = get_cached_entry(key)
+        if entry is not None:
+            return conditional_response(request, key, entry)
+
+        before = get_versions([*self.cache_scopes, CHANGES])
+        response = super().get(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        versions = get_versions_since(before, self.get_cache_scopes(response.data))
+        if versions is None:
+            return response
+        entry = set_cached_entry(key, response.data, versions)
+        return conditional_response(request, key, entry, response)
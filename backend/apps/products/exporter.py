@@ -0,0 +1,86 @@
+"""
+Streaming catalog export to CSV or JSON Lines.
+
+Rows are read as a values() projection through a server-side cursor
+(iterator(chunk_size=...)) and encoded one at a time, so memory use stays
+flat however large the catalog is. Column names match the import feed where
+they overlap, so an export can be edited and imported again.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery
+
+from .models import ProductImage
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (column, values() lookup)
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('sku', 'sku'),
+    ('name', 'name'),
+    ('slug', 'slug'),
+    ('status', 'status'),
+    ('category', 'category__slug'),
+    ('brand', 'brand__slug'),
+    ('price', 'price'),
+    ('compare_price', 'compare_price'),
+    ('quantity', 'quantity'),
+    ('low_stock_threshold', 'low_stock_threshold'),
+    ('track_quantity', 'track_quantity'),
+    ('is_featured', 'is_featured'),
+    ('primary_image', 'primary_image_path'),
+    ('rating_count', 'rating_count'),
+    ('rating_sum', 'rating_sum'),
+    ('updated_at', 'updated_at'),
+]
+EXPORT_COLUMNS = [column for column, _ in EXPORT_FIELDS] + ['average_rating']
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one dict per product in `queryset`, in primary key order"""
+    primary_image = ProductImage.objects.filter(
+        product=OuterRef('pk'), is_primary=True
+    ).values('image')[:1]
+    storage = ProductImage._meta.get_field('image').storage
+
+    rows = queryset.annotate(primary_image_path=Subquery(primary_image)).order_by('pk').values(
+        *(lookup for _, lookup in EXPORT_FIELDS)
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        product = {column: row[lookup] for column, lookup in EXPORT_FIELDS}
+        if product['primary_image']:
+            product['primary_image'] = storage.url(product['primary_image'])
+        product['average_rating'] = (
+            round(product['rating_sum'] / product['rating_count'], 2)
+            if product['rating_count'] else 0
+        )
+        yield product
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+
+def encode_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+# format -> (encoder, content type)
+EXPORT_FORMATS = {
+    'csv': (encode_csv, 'text/csv'),
+    'jsonl': (encode_jsonl, 'application/x-ndjson'),
+}
@@ -1,11 +1,12 @@
 import django_filters
-from .models import Product
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from .models import Category, Product
 
 
 class ProductFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name="price", lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name="price", lookup_expr='lte')
-    category = django_filters.CharFilter(field_name='category__slug')
+    category = django_filters.CharFilter(method='filter_category')
     brand = django_filters.CharFilter(field_name='brand__slug')
     featured = django_filters.BooleanFilter(field_name='is_featured')
     bestseller = django_filters.BooleanFilter(field_name='is_bestseller')
@@ -13,4 +14,83 @@ class ProductFilter(django_filters.FilterSet):
 
     class Meta:
         model = Product
-        fields = ['category', 'brand', 'min_price', 'max_price', 'featured', 'bestseller', 'new']
\ No newline at end of file
+        fields = ['category', 'brand', 'min_price', 'max_price', 'featured', 'bestseller', 'new']
+
+    def filter_category(self, queryset, name, value):
+        """Match the category and all of its descendants"""
+        return queryset.filter(category__in=Category.objects.subtree(value))
+
+
+# Price ranges used for the price facet: (lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [(0, 25), (25, 50), (50, 100), (100, 250), (250, None)]
+
+FACETS = ['brand', 'category', 'price', 'stock']
+
+
+def _price_bucket_label(lower, upper):
+    return f'{lower}+' if upper is None else f'{lower}-{upper}'
+
+
+def _facet_expressions(facet):
+    """Return the (value, label) expressions a facet groups by"""
+    if facet == 'brand':
+        return F('brand__slug'), F('brand__name')
+    if facet == 'category':
+        return F('category__slug'), F('category__name')
+    if facet == 'price':
+        bucket = Case(
+            *[
+                When(
+                    Q(price__gte=lower) & (Q() if upper is None else Q(price__lt=upper)),
+                    then=Value(_price_bucket_label(lower, upper))
+                )
+                for lower, upper in PRICE_BUCKETS
+            ],
+            output_field=CharField()
+        )
+        return bucket, bucket
+    if facet == 'stock':
+        in_stock = Case(
+            When(Q(track_quantity=False) | Q(quantity__gt=0), then=Value('in_stock')),
+            default=Value('out_of_stock'),
+            output_field=CharField()
+        )
+        return in_stock, in_stock
+    raise ValueError(f'Unknown facet: {facet}')
+
+
+def facet_counts(queryset, facets):
+    """Count products per facet value with one UNION ALL of grouped aggregates"""
+    facets = [facet for facet in FACETS if facet in facets]
+    if not facets:
+        return {}
+
+    grouped = []
+    for facet in facets:
+        value, label = _facet_expressions(facet)
+        grouped.append(
+            queryset.order_by()
+            .annotate(facet=Value(facet), facet_value=value, facet_label=label)
+            .values('facet', 'facet_value', 'facet_label')
+            .annotate(count=Count('pk'))
+        )
+
+    rows = grouped[0].union(*grouped[1:], all=True) if len(grouped) > 1 else grouped[0]
+
+    counts = {facet: [] for facet in facets}
+    for row in rows:
+        if row['facet_value'] is None:
+            continue
+        counts[row['facet']].append({
+            'value': row['facet_value'],
+            'label': row['facet_label'],
+            'count': row['count'],
+        })
+
+    price_order = [_price_bucket_label(*bucket) for bucket in PRICE_BUCKETS]
+    for facet, values in counts.items():
+        if facet == 'price':
+            values.sort(key=lambda item: price_order.index(item['value']))
+        else:
+            values.sort(key=lambda item: (-item['count'], item['label']))
+    return counts
@@ -0,0 +1,91 @@
+"""
+Merchandising flags maintained from sales and publication dates.
+
+`is_bestseller` marks the top products of each category by a time-decayed
+sales score: every unit sold counts 1, halving every SALES_HALF_LIFE_DAYS,
+over the last SALES_WINDOW_DAYS. `is_new` is cleared once a product has
+been published for longer than NEW_ARRIVAL_DAYS. Both are single set-based
+UPDATEs that only write the rows whose flag changes.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Product
+
+SALES_WINDOW_DAYS = 90
+SALES_HALF_LIFE_DAYS = 14
+EXCLUDED_ORDER_STATUSES = ['cancelled', 'refunded']
+
+BESTSELLER_SQL = '''
+    WITH sales AS (
+        SELECT item.product_id,
+            SUM(item.quantity * exp(
+                -ln(2) * extract(epoch FROM %(now)s - o.created_at) / %(half_life)s
+            )) AS score
+        FROM {order_item} AS item
+        JOIN {order} AS o ON o.id = item.order_id
+        WHERE o.created_at >= %(since)s AND NOT (o.status = ANY(%(excluded_statuses)s))
+        GROUP BY item.product_id
+    ),
+    ranked AS (
+        SELECT product.id,
+            product.status = 'published' AND COALESCE(sales.score, 0) > 0 AND row_number() OVER (
+                PARTITION BY product.category_id
+                ORDER BY product.status = 'published' DESC, sales.score DESC NULLS LAST, product.id
+            ) <= %(limit)s AS is_bestseller
+        FROM {product} AS product
+        LEFT JOIN sales ON sales.product_id = product.id
+    )
+    UPDATE {product} AS product SET is_bestseller = ranked.is_bestseller
+    FROM ranked
+    WHERE product.id = ranked.id AND product.is_bestseller IS DISTINCT FROM ranked.is_bestseller
+    RETURNING product.id
+'''
+
+
+def update_bestsellers(limit=None, now=None):
+    """Flag the top `limit` sellers per category; return the ids that changed"""
+    if limit is None:
+        limit = settings.BESTSELLERS_PER_CATEGORY
+    now = now or timezone.now()
+    tables = {
+        'order': apps.get_model('orders', 'Order')._meta.db_table,
+        'order_item': apps.get_model('orders', 'OrderItem')._meta.db_table,
+        'product': Product._meta.db_table,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(BESTSELLER_SQL.format(**tables), {
+            'now': now,
+            'since': now - timedelta(days=SALES_WINDOW_DAYS),
+            'half_life': timedelta(days=SALES_HALF_LIFE_DAYS).total_seconds(),
+            'excluded_statuses': EXCLUDED_ORDER_STATUSES,
+            'limit': limit,
+        })
+        return [row[0] for row in cursor.fetchall()]
+
+
+def expire_new_arrivals(days=None, now=None):
+    """Clear is_new on products published more than `days` ago; return their ids"""
+    if days is None:
+        days = settings.NEW_ARRIVAL_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    expired = Product.objects.filter(status='published', is_new=True, published_at__lt=cutoff)
+    product_ids = list(expired.values_list('pk', flat=True))
+    expired.filter(pk__in=product_ids).update(is_new=False)
+    return product_ids
+
+
+def update_product_flags(bestsellers_per_category=None, new_arrival_days=None):
+    """Refresh both flags in one transaction; return (bestseller changes, expired new arrivals)"""
+    with transaction.atomic():
+        bestsellers = update_bestsellers(bestsellers_per_category)
+        expired = expire_new_arrivals(new_arrival_days)
+    changed = set(bestsellers) | set(expired)
+    if changed:
+        cache.bump('products', *(f'product:{pk}' for pk in changed))
+    return len(bestsellers), len(expired)
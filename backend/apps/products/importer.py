@@ -0,0 +1,238 @@
+"""
+Bulk product import from CSV or JSON Lines feeds.
+
+Rows are read lazily and written in chunks. Each chunk is validated in
+memory, upserted by SKU with INSERT ... ON CONFLICT (one statement per set of
+columns present), and then has its search documents and cache versions
+refreshed in bulk, since bulk_create() sends no signals.
+"""
+import codecs
+import csv
+import json
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Brand, Category, Product
+from .serializers import ProductImportSerializer
+
+FORMATS = ['csv', 'jsonl']
+
+# A new product can't be created without these
+REQUIRED_FOR_CREATE = ['name', 'description', 'price']
+
+# Updating any of these can change category and brand product counts
+COUNT_FIELDS = {'status', 'category', 'brand'}
+
+
+def is_utf8(chunks):
+    """Whether an iterable of byte chunks decodes as UTF-8, checked without joining them"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for chunk in chunks:
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def read_rows(lines, format):
+    """Yield (row number, row) from an iterable of text lines"""
+    if format == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            # Empty cells leave the column unchanged; cells beyond the header have no key
+            yield number, {key: value for key, value in row.items() if key and value != ''}
+        return
+
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+class ProductImporter:
+    """
+    Upsert products by SKU from (row number, row) pairs.
+
+    Rows that fail validation are collected in `errors` instead of aborting
+    the import; each chunk is written in its own transaction, and a chunk the
+    database rejects is reported row by row.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.updated = 0
+        # Valid rows overridden by a later row for the same SKU in their chunk
+        self.superseded = 0
+        self.errors = []
+        self.elapsed = 0
+        self.context = {
+            'categories': dict(Category.objects.values_list('slug', 'pk')),
+            'brands': dict(Brand.objects.values_list('slug', 'pk')),
+        }
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.superseded + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def run(self, rows):
+        started = time.monotonic()
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            self.import_chunk(chunk)
+        self.elapsed = time.monotonic() - started
+        return self
+
+    def add_error(self, number, row, errors):
+        sku = row.get('sku') if isinstance(row, dict) else None
+        self.errors.append({'row': number, 'sku': sku, 'errors': errors})
+
+    def import_chunk(self, chunk):
+        # The last row for a SKU wins; ON CONFLICT can't touch a row twice
+        valid = {}
+        for number, row in chunk:
+            if not isinstance(row, dict):
+                self.add_error(number, row, {'non_field_errors': ['Expected a JSON object.']})
+                continue
+            serializer = ProductImportSerializer(data=row, context=self.context)
+            if serializer.is_valid():
+                sku = serializer.validated_data['sku']
+                self.superseded += sku in valid
+                valid[sku] = (number, row, serializer.validated_data)
+            else:
+                self.add_error(number, row, serializer.errors)
+        self.reject_slug_conflicts(valid)
+        if not valid:
+            return
+
+        stored = list(Product.objects.filter(sku__in=valid).values_list('sku', 'slug', 'category_id', 'brand_id'))
+        existing = {sku: slug for sku, slug, _, _ in stored}
+        new_products = []
+        groups = defaultdict(list)
+        written = []
+        for sku, (number, row, data) in valid.items():
+            if sku not in existing:
+                missing = [field for field in REQUIRED_FOR_CREATE if data.get(field) is None]
+                if missing:
+                    self.add_error(number, row, {field: ['This field is required.'] for field in missing})
+                    continue
+
+            product = self.build_product(data)
+            if sku in existing:
+                # Only the columns in `data` are updated; fill the rest so the
+                # proposed row passes NOT NULL checks before the conflict
+                product.slug = product.slug or existing[sku]
+                if product.price is None:
+                    product.price = 0
+            else:
+                new_products.append(product)
+            written.append((number, row))
+            fields = frozenset(data) - {'sku'}
+            # A known SKU with no other columns matches but has nothing to write
+            if fields:
+                groups[fields].append(product)
+
+        try:
+            self.write(groups, new_products, previous_relations=[relations for _, _, *relations in stored])
+        except IntegrityError as exc:
+            message = f'Chunk rolled back: {str(exc).splitlines()[0]}'
+            for number, row in written:
+                self.add_error(number, row, {'non_field_errors': [message]})
+            return
+        self.created += len(new_products)
+        self.updated += len(written) - len(new_products)
+
+    def reject_slug_conflicts(self, valid):
+        """
+        Drop rows whose explicit slug belongs to another SKU, in the database
+        or earlier in the chunk, so they are reported instead of failing the
+        whole chunk on the unique index.
+        """
+        slugs = {data['slug'] for _, _, data in valid.values() if data.get('slug')}
+        if not slugs:
+            return
+        owners = dict(Product.objects.filter(slug__in=slugs).values_list('slug', 'sku'))
+        claimed = {}
+        for sku, (number, row, data) in list(valid.items()):
+            slug = data.get('slug')
+            if not slug:
+                continue
+            owner = owners.get(slug, claimed.get(slug, sku))
+            if owner != sku:
+                self.add_error(number, row, {'slug': [f'Slug is already used by SKU {owner}.']})
+                del valid[sku]
+                continue
+            claimed[slug] = sku
+
+    def build_product(self, data):
+        data = dict(data)
+        for relation in ('category', 'brand'):
+            if relation in data:
+                data[f'{relation}_id'] = data.pop(relation)
+        product = Product(**data)
+        if product.status == 'published':
+            product.published_at = timezone.now()
+        return product
+
+    def write(self, groups, new_products, previous_relations=()):
+        auto_slugs = [product for product in new_products if not product.slug]
+        # Explicit slugs in the chunk aren't in the database yet
+        reserved = {product.slug for products in groups.values() for product in products if product.slug}
+        # Updates that set a status; published ones get published_at if they never had it
+        published = [
+            product.sku for fields, products in groups.items() if 'status' in fields
+            for product in products if product.status == 'published'
+        ]
+        for attempt in range(Product.SLUG_ATTEMPTS):
+            Product.objects.allocate_slugs(auto_slugs, reserved=reserved)
+            try:
+                with transaction.atomic():
+                    for fields, products in groups.items():
+                        Product.objects.bulk_create(
+                            products,
+                            update_conflicts=True,
+                            unique_fields=['sku'],
+                            update_fields=[*fields, 'updated_at'],
+                        )
+                    Product.objects.filter(sku__in=published, published_at__isnull=True).update(
+                        published_at=timezone.now()
+                    )
+                break
+            except IntegrityError:
+                # A concurrent writer took one of the allocated slugs
+                if attempt == Product.SLUG_ATTEMPTS - 1 or not auto_slugs:
+                    raise
+                for product in auto_slugs:
+                    product.slug = ''
+
+        skus = [product.sku for products in groups.values() for product in products]
+        rows = list(Product.objects.filter(sku__in=skus).values_list('pk', 'category_id', 'brand_id'))
+        product_ids = [pk for pk, _, _ in rows]
+        Product.objects.update_search_vectors(product_ids)
+        scopes = ['products', *(f'product:{pk}' for pk in product_ids)]
+        if new_products or any(fields & COUNT_FIELDS for fields in groups):
+            relations = [(category_id, brand_id) for _, category_id, brand_id in rows] + list(previous_relations)
+            # Category counts, shown with every product in the category or below it
+            categories = Category.objects.ancestor_ids({category_id for category_id, _ in relations})
+            brands = {brand_id for _, brand_id in relations if brand_id}
+            scopes += [
+                'categories', 'brands',
+                *(f'category:{pk}' for pk in categories),
+                *(f'brand:{pk}' for pk in brands),
+            ]
+        cache.bump(*scopes)
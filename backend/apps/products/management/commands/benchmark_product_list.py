@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.products.models import Product, ProductImage
+from apps.products.readers import LIST_FIELDS, product_rows, serialize_products
+from apps.products.serializers import ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ProductListSerializer with the values() fast path. Sample '
+        'products are created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[20, 100, 1000],
+            help='Page sizes to time (default: 20 100 1000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per page size; the fastest one is reported (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_products(max(options['rows']))
+            queryset = ProductListSerializer.optimize_queryset(Product.objects.all(), None)
+
+            self.stdout.write(f"{'rows':>6} {'serializer ms':>14} {'fast path ms':>13} {'speedup':>8}")
+            for count in options['rows']:
+                page = queryset[:count]
+                slow = self.time(
+                    lambda: ProductListSerializer(list(page), many=True).data, options['repeat']
+                )
+                fast = self.time(
+                    lambda: serialize_products(list(product_rows(page, LIST_FIELDS)), LIST_FIELDS),
+                    options['repeat'],
+                )
+                self.stdout.write(f'{count:>6} {slow * 1000:>14.2f} {fast * 1000:>13.2f} {slow / fast:>7.1f}x')
+
+            transaction.set_rollback(True)
+
+    def create_products(self, count):
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Benchmark product {number}',
+                slug=f'benchmark-product-{number}',
+                sku=f'BENCH-{number:06d}',
+                description='Benchmark product',
+                price=number % 100 + 10,
+                compare_price=number % 100 + 20 if number % 2 else None,
+                quantity=number % 7,
+                rating_count=number % 5,
+                rating_sum=(number % 5) * 4,
+                status='published',
+            )
+            for number in range(count)
+        )
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f'products/{product.sku}.jpg', is_primary=True)
+            for product in products
+        )
+
+    def time(self, run, repeat):
+        """Fastest wall time of `repeat` runs, in seconds"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
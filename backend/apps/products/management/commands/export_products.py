@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.exporter import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_rows
+from apps.products.filters import ProductFilter
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog to a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORT_FORMATS),
+            default='csv',
+            help='Output format (default: csv)',
+        )
+        parser.add_argument('--output', help='File to write to (default: stdout)')
+        parser.add_argument(
+            '--filter',
+            action='append',
+            default=[],
+            metavar='NAME=VALUE',
+            help='Product list filter, e.g. category=shoes or min_price=10 (can be repeated)',
+        )
+        parser.add_argument('--status', help='Only export products with this status')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'Rows fetched per round trip (default: {EXPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            filters = dict(item.split('=', 1) for item in options['filter'])
+        except ValueError:
+            raise CommandError('Filters must look like NAME=VALUE')
+
+        filterset = ProductFilter(filters, queryset=Product.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+        queryset = filterset.qs
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+
+        encode, _ = EXPORT_FORMATS[options['format']]
+        lines = encode(export_rows(queryset, chunk_size=options['chunk_size']))
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,62 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.importer import FORMATS, ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create or update products by SKU from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON Lines file to import')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='File format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows written per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write rejected rows and their errors to this JSON Lines file',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if format not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {path}; pass --format')
+
+        importer = ProductImporter(chunk_size=options['chunk_size'])
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as lines:
+                importer.run(read_rows(lines, format))
+        except OSError as exc:
+            raise CommandError(exc)
+        except UnicodeDecodeError:
+            # Chunks before the bad line are already committed
+            raise CommandError(
+                f'{path} is not UTF-8 encoded; stopped after {importer.rows} rows '
+                f'({importer.created} created, {importer.updated} updated, {len(importer.errors)} rejected)'
+            )
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as report:
+                for error in importer.errors:
+                    report.write(json.dumps(error) + '\n')
+        else:
+            for error in importer.errors[:20]:
+                self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {importer.rows} rows in {importer.elapsed:.1f}s '
+            f'({importer.rows_per_second:.0f} rows/sec): {importer.created} created, '
+            f'{importer.updated} updated, {len(importer.errors)} rejected, '
+            f'{importer.superseded} superseded by a later row'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored rating aggregates on products from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='slugs',
+            help='Only rebuild the product with this slug (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        product_ids = None
+        if options['slugs']:
+            product_ids = list(
+                Product.objects.filter(slug__in=options['slugs']).values_list('pk', flat=True)
+            )
+
+        updated = Product.objects.rebuild_rating_aggregates(product_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} products'))
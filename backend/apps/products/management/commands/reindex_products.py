@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search document for every product, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of products updated per statement (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        total = 0
+
+        while True:
+            product_ids = list(
+                Product.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not product_ids:
+                break
+
+            total += Product.objects.update_search_vectors(product_ids)
+            last_pk = product_ids[-1]
+            self.stdout.write(f'Reindexed {total} products...')
+
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} products'))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.products.flags import update_product_flags
+
+
+class Command(BaseCommand):
+    help = 'Flag bestsellers from recent sales and expire new arrival flags'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bestsellers',
+            type=int,
+            default=settings.BESTSELLERS_PER_CATEGORY,
+            help=f'Bestsellers per category (default: {settings.BESTSELLERS_PER_CATEGORY})',
+        )
+        parser.add_argument(
+            '--new-days',
+            type=int,
+            default=settings.NEW_ARRIVAL_DAYS,
+            help=f'Days a product counts as new after publishing (default: {settings.NEW_ARRIVAL_DAYS})',
+        )
+
+    def handle(self, *args, **options):
+        bestsellers, expired = update_product_flags(options['bestsellers'], options['new_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{bestsellers} bestseller flags changed, {expired} new arrival flags cleared'
+        ))
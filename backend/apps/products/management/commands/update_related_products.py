@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.related import ORDER_BATCH_SIZE, update_related_products
+
+
+class Command(BaseCommand):
+    help = 'Update "frequently bought together" products from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recount all orders instead of those placed since the last run',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ORDER_BATCH_SIZE,
+            help=f'Orders counted per statement (default: {ORDER_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        run = update_related_products(full=options['full'], batch_size=options['batch_size'])
+        if run is None:
+            self.stdout.write('No new orders')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {run.orders} orders in {run.elapsed:.1f}s, placed up to {run.orders_until:%Y-%m-%d %H:%M}'
+        ))
@@ -1,5 +1,122 @@
 # apps/products/managers.py
-from django.db import models
+import re
+from itertools import chain
+
+from django.apps import apps
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import cache
+
+# Room kept after a generated base slug for a '-<n>' suffix
+SLUG_SUFFIX_LENGTH = 10
+
+# Rows per UPDATE ... FROM (VALUES ...) statement in apply_stock_updates()
+STOCK_UPDATE_CHUNK_SIZE = 1000
+
+STOCK_UPDATE_SQL = '''
+    UPDATE {table} AS product SET
+        price = COALESCE(batch.price, product.price),
+        compare_price = CASE WHEN batch.set_compare_price
+            THEN batch.compare_price ELSE product.compare_price END,
+        quantity = COALESCE(batch.quantity, product.quantity),
+        updated_at = %s
+    FROM (VALUES {values}) AS batch (sku, price, compare_price, set_compare_price, quantity)
+    JOIN {table} AS previous ON previous.sku = batch.sku
+    WHERE product.id = previous.id
+    RETURNING product.id, product.sku, product.name, product.price, product.compare_price,
+        product.quantity, previous.quantity, product.low_stock_threshold, product.track_quantity
+'''
+STOCK_UPDATE_ROW = '(%s, %s::numeric, %s::numeric, %s::boolean, %s::integer)'
+STOCK_UPDATE_COLUMNS = [
+    'id', 'sku', 'name', 'price', 'compare_price',
+    'quantity', 'previous_quantity', 'low_stock_threshold', 'track_quantity',
+]
+
+# {category id: published products in it and its descendants}, counting each
+# product once for every id in its category's path
+PRODUCTS_COUNT_SQL = '''
+    SELECT jsonb_object_agg(ancestor_id, products) FROM (
+        SELECT ancestor_id, COUNT(*) AS products
+        FROM {product} AS product
+        JOIN {category} AS category ON category.id = product.category_id
+        CROSS JOIN unnest(string_to_array(rtrim(category.path, '/'), '/')) AS ancestor_id
+        WHERE product.status = 'published'
+        GROUP BY ancestor_id
+    ) AS counts
+'''
+
+# Text search configuration used for both the stored document and queries
+SEARCH_CONFIG = 'english'
+
+# Weighted document: name > category/brand > short description > description
+SEARCH_DOCUMENT = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('category__name', 'brand__name', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('short_description', weight='C', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+)
+
+
+def build_search_query(text):
+    """Turn free text into a prefix-matching tsquery, e.g. 'blue shi' -> 'blue:* & shi:*'"""
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw',
+        config=SEARCH_CONFIG
+    )
+
+class CategoryManager(models.Manager):
+    def with_products_count(self, queryset=None):
+        """
+        Annotate published product counts, including descendant categories.
+
+        The counts come from one grouped aggregate over products and the
+        ancestors in their category's path, which PostgreSQL runs once per
+        statement (it isn't correlated) and each row reads by id.
+        """
+        if queryset is None:
+            queryset = self.all()
+        Product = self.model._meta.get_field('products').related_model
+        counts = PRODUCTS_COUNT_SQL.format(
+            product=Product._meta.db_table, category=self.model._meta.db_table
+        )
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        return queryset.annotate(published_products_count=RawSQL(
+            f"COALESCE((({counts}) ->> {table}.id::text)::integer, 0)", (),
+            output_field=models.IntegerField()
+        ))
+
+    def ancestor_ids(self, category_ids):
+        """Ids of the given categories and all of their ancestors"""
+        paths = self.filter(pk__in=[pk for pk in category_ids if pk]).values_list('path', flat=True)
+        return {int(pk) for path in paths for pk in path.split('/') if pk}
+
+    def subtree(self, slug):
+        """Return the category with this slug and all of its descendants"""
+        path = self.filter(slug=slug).values_list('path', flat=True).first()
+        if not path:
+            return self.none()
+        return self.filter(path__startswith=path)
+
+
+class BrandManager(models.Manager):
+    def with_products_count(self, queryset=None):
+        """Annotate published product counts with one grouped aggregate"""
+        if queryset is None:
+            queryset = self.all()
+        return queryset.annotate(
+            published_products_count=Count('products', filter=Q(products__status='published'))
+        )
+
 
 class ProductManager(models.Manager):
     def active(self):
@@ -11,8 +128,9 @@ class ProductManager(models.Manager):
         return self.filter(status='published', quantity__gt=0)
 
     def by_category(self, category_slug):
-        """Return products by category slug"""
-        return self.filter(category__slug=category_slug, status='published')
+        """Return products in a category (by slug) or any of its descendants"""
+        Category = self.model._meta.get_field('category').related_model
+        return self.filter(category__in=Category.objects.subtree(category_slug), status='published')
 
     def featured(self):
         """Return featured products"""
@@ -27,5 +145,162 @@ class ProductManager(models.Manager):
         return self.filter(is_new=True, status='published')
 
     def low_stock(self):
-        """Return products with low stock"""
-        return self.filter(quantity__lte=models.F('low_stock_threshold'), track_quantity=True, status='published')
\ No newline at end of file
+        """Return products with low stock (or none), served by the product_low_stock partial index"""
+        return self.filter(quantity__lte=models.F('low_stock_threshold'), track_quantity=True, status='published')
+
+    def allocate_slugs(self, products, reserved=()):
+        """
+        Give every product without a slug a unique one derived from its name.
+        `reserved` slugs count as taken, e.g. explicit slugs elsewhere in the
+        same batch that aren't saved yet.
+
+        Taken '<base>' and '<base>-<n>' slugs for the whole batch are read in one
+        indexed query. A product gets its bare base while that is free; only
+        when it is taken are duplicates numbered past the highest existing
+        suffix, so two new 'Blue T-Shirt's next to an existing one get
+        'blue-t-shirt-1' and 'blue-t-shirt-2'. Every candidate is checked
+        against the taken slugs and those already handed out in this call, so
+        a batch never repeats one ('Blue T-Shirt 1' next to two 'Blue T-Shirt's).
+        A concurrent writer can still claim the same slug first, so callers
+        retry on IntegrityError.
+        """
+        pending = [product for product in products if not product.slug]
+        if not pending:
+            return products
+
+        max_length = self.model._meta.get_field('slug').max_length - SLUG_SUFFIX_LENGTH
+        bases = [slugify(product.name)[:max_length].strip('-') or 'product' for product in pending]
+        unique_bases = set(bases)
+        taken = Q()
+        for base in unique_bases:
+            taken |= Q(slug=base) | Q(slug__startswith=f'{base}-', slug__regex=rf'^{base}-[0-9]+$')
+
+        # Slugs in the database, reserved (by the caller or for routes), or assigned below
+        used = set(chain(
+            self.filter(taken).values_list('slug', flat=True), reserved, self.model.RESERVED_SLUGS
+        ))
+        # Highest suffix in use per base, where numbering starts
+        highest_suffix = {}
+        for slug in used:
+            base, _, suffix = slug.rpartition('-')
+            if base in unique_bases and suffix.isdigit():
+                highest_suffix[base] = max(highest_suffix.get(base, 0), int(suffix))
+
+        for product, base in zip(pending, bases):
+            slug = base
+            if slug in used:
+                suffix = highest_suffix.get(base, 0) + 1
+                while f'{base}-{suffix}' in used:
+                    suffix += 1
+                slug = f'{base}-{suffix}'
+                highest_suffix[base] = suffix
+            product.slug = slug
+            used.add(slug)
+        return products
+
+    def apply_stock_updates(self, updates):
+        """
+        Apply {sku, price?, compare_price?, quantity?} rows with set-based UPDATEs.
+
+        Omitted keys leave the column unchanged (compare_price may be set to
+        None). Runs in one transaction and returns a {sku: row} dict of the
+        updated products, including `previous_quantity`; unknown SKUs are
+        missing from it. Sends no signals: callers handle stock alerts.
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        now = timezone.now()
+        updated = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(updates), STOCK_UPDATE_CHUNK_SIZE):
+                chunk = updates[start:start + STOCK_UPDATE_CHUNK_SIZE]
+                params = [now]
+                for update in chunk:
+                    params += [
+                        update['sku'],
+                        update.get('price'),
+                        update.get('compare_price'),
+                        'compare_price' in update,
+                        update.get('quantity'),
+                    ]
+                values = ', '.join([STOCK_UPDATE_ROW] * len(chunk))
+                cursor.execute(STOCK_UPDATE_SQL.format(table=table, values=values), params)
+                for row in cursor.fetchall():
+                    row = dict(zip(STOCK_UPDATE_COLUMNS, row))
+                    updated[row['sku']] = row
+
+        cache.bump('products', *(f"product:{row['id']}" for row in updated.values()))
+        return updated
+
+    def search(self, text, queryset=None):
+        """Full-text search over the stored search document, annotated with `rank`"""
+        if queryset is None:
+            queryset = self.all()
+        query = build_search_query(text)
+        if query is None:
+            return queryset.none()
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+
+    def with_verified_review_count(self, queryset=None):
+        """Annotate the number of approved reviews from verified purchasers"""
+        if queryset is None:
+            queryset = self.all()
+        ProductReview = apps.get_model('reviews', 'ProductReview')
+        verified = ProductReview.objects.verified_purchases().filter(
+            product=OuterRef('pk'), is_approved=True
+        ).order_by().values('product').annotate(count=Count('pk')).values('count')
+        return queryset.annotate(
+            verified_review_count=Coalesce(Subquery(verified), Value(0))
+        )
+
+    def update_search_vectors(self, product_ids=None):
+        """Rebuild the stored search document in one UPDATE (joins run in a subquery)"""
+        document = self.filter(pk=OuterRef('pk')).annotate(
+            document=SEARCH_DOCUMENT
+        ).values('document')[:1]
+
+        queryset = self.all()
+        if product_ids is not None:
+            queryset = queryset.filter(pk__in=product_ids)
+        return queryset.update(search_vector=Subquery(document))
+
+    def adjust_rating_aggregates(self, product_id, rating, delta):
+        """Add (delta=1) or remove (delta=-1) one approved rating from a product"""
+        histogram_field = f'rating_{rating}_count'
+        updated = self.filter(pk=product_id).update(**{
+            'rating_count': F('rating_count') + delta,
+            'rating_sum': F('rating_sum') + delta * rating,
+            histogram_field: F(histogram_field) + delta,
+        })
+        cache.bump(f'product:{product_id}')
+        return updated
+
+    def rebuild_rating_aggregates(self, product_ids=None):
+        """Recompute rating aggregates from approved reviews in a single UPDATE"""
+        ProductReview = apps.get_model('reviews', 'ProductReview')
+        approved = ProductReview.objects.filter(
+            product=OuterRef('pk'), is_approved=True
+        ).order_by().values('product')
+
+        def aggregate(expression):
+            return Coalesce(
+                Subquery(approved.annotate(value=expression).values('value')),
+                Value(0),
+            )
+
+        aggregates = {
+            'rating_count': aggregate(Count('id')),
+            'rating_sum': aggregate(Sum('rating')),
+        }
+        for rating in range(1, 6):
+            aggregates[f'rating_{rating}_count'] = aggregate(
+                Count('id', filter=Q(rating=rating))
+            )
+
+        queryset = self.all()
+        if product_ids is not None:
+            queryset = queryset.filter(pk__in=product_ids)
+        updated = queryset.update(**aggregates)
+        cache.bump(*(f'product:{pk}' for pk in queryset.values_list('pk', flat=True)))
+        return updated
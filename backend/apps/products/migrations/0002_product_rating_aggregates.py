@@ -0,0 +1,76 @@
+# Generated by Django 4.2.10 on 2026-10-16 22:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductReview = apps.get_model('reviews', 'ProductReview')
+    approved = ProductReview.objects.filter(
+        product=OuterRef('pk'), is_approved=True
+    ).order_by().values('product')
+
+    def aggregate(expression):
+        return Coalesce(
+            Subquery(approved.annotate(value=expression).values('value')),
+            Value(0),
+        )
+
+    aggregates = {
+        'rating_count': aggregate(Count('id')),
+        'rating_sum': aggregate(Sum('rating')),
+    }
+    for rating in range(1, 6):
+        aggregates[f'rating_{rating}_count'] = aggregate(
+            Count('id', filter=Q(rating=rating))
+        )
+    Product.objects.update(**aggregates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
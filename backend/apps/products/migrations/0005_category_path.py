@@ -0,0 +1,38 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def path_for(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (path_for(parent_id) if parent_id else '') + f'{pk}/'
+        return paths[pk]
+
+    for pk in parents:
+        Category.objects.filter(pk=pk).update(path=path_for(pk))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_trigram_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_like', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
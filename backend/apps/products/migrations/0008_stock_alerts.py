@@ -0,0 +1,53 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('low_stock', 'Low stock'), ('out_of_stock', 'Out of stock')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LowStockProduct',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Low stock product',
+                'verbose_name_plural': 'Low stock products',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('products.product',),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('low_stock_threshold')), ('status', 'published'), ('track_quantity', True)), fields=['quantity', 'id'], name='product_low_stock'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['created_at'], name='stock_alert_pending'),
+        ),
+    ]
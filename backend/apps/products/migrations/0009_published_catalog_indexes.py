@@ -0,0 +1,49 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_created_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_price_id',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-created_at', '-id'], name='product_published_created'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['price', 'id'], name='product_published_price'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['category', '-created_at', '-id'], name='product_published_category'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['brand', '-created_at', '-id'], name='product_published_brand'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published'), ('is_featured', True)), fields=['-created_at', '-id'], name='product_published_featured'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published'), ('is_bestseller', True)), fields=['-created_at', '-id'], name='product_published_bestseller'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published'), ('is_new', True)), fields=['-created_at', '-id'], name='product_published_new'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.10 on 2026-10-16 23:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', '-views'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-popularity', '-id'], name='product_published_popularity'),
+        ),
+        migrations.AddField(
+            model_name='productviewcount',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='view_counts', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewcount',
+            index=models.Index(fields=['date'], name='product_view_count_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='productviewcount',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='product_view_count_unique'),
+        ),
+    ]
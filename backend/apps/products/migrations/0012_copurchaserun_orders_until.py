@@ -0,0 +1,39 @@
+# Generated by Django 4.2.10 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def set_orders_until(apps, schema_editor):
+    """Earlier runs counted orders up to last_order_id; continue from its created_at"""
+    CoPurchaseRun = apps.get_model('products', 'CoPurchaseRun')
+    Order = apps.get_model('orders', 'Order')
+    created_at = Order.objects.filter(pk=OuterRef('last_order_id')).values('created_at')[:1]
+    CoPurchaseRun.objects.update(orders_until=Coalesce(Subquery(created_at), F('finished_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_keyset_pagination_indexes'),
+        ('products', '0011_product_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='copurchaserun',
+            name='orders_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_orders_until, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='copurchaserun',
+            name='orders_until',
+            field=models.DateTimeField(),
+        ),
+        migrations.RemoveField(
+            model_name='copurchaserun',
+            name='last_order_id',
+        ),
+    ]
@@ -1,10 +1,15 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, JSONObject, Substr
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.urls import reverse
 from apps.accounts.models import User
 import uuid
-from .managers import ProductManager
+from .managers import BrandManager, CategoryManager, ProductManager
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
@@ -17,28 +22,81 @@ class Category(models.Model):
         related_name='children'
     )
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Resized copies of `image`, see apps.core.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     meta_title = models.CharField(max_length=200, blank=True, null=True)
     meta_description = models.TextField(blank=True, null=True)
+    # Materialized path of ancestor ids, e.g. '1/4/9/' (maintained in save)
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = CategoryManager()
 
     class Meta:
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='category_name_trgm'),
+            models.Index(fields=['path'], opclasses=['varchar_pattern_ops'], name='category_path_like'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id and self.path:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+            if parent_path and parent_path.startswith(self.path):
+                raise ValidationError({'parent': 'A category cannot be moved under itself or its descendants.'})
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Keep the stored path; an in-memory copy may predate an ancestor move
+            if self.pk:
+                self.path = Category.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('path', flat=True).first() or ''
+            super().save(*args, **kwargs)
+            self.update_path()
+
+    def update_path(self):
+        """Recompute this category's path and rewrite the paths of its descendants"""
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).get()
+        new_path = f'{parent_path}{self.pk}/'
+        old_path = self.path
+
+        if new_path == old_path:
+            return
+        if old_path and parent_path.startswith(old_path):
+            raise ValueError('A category cannot be moved under itself or its descendants.')
+
+        if old_path:
+            # Move the whole subtree by swapping the path prefix in one UPDATE
+            Category.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+            )
+        else:
+            Category.objects.filter(pk=self.pk).update(path=new_path)
+        self.path = new_path
+
+    @property
+    def depth(self):
+        return self.path.count('/') - 1
 
     @property
     def products_count(self):
-        return self.products.filter(status='published').count()
+        # Prefer the value from CategoryManager.with_products_count()
+        if hasattr(self, 'published_products_count'):
+            return self.published_products_count
+        return Product.objects.filter(
+            status='published', category__path__startswith=self.path
+        ).count()
 
 
 class Brand(models.Model):
@@ -46,13 +104,19 @@ class Brand(models.Model):
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     logo = models.ImageField(upload_to='brands/', blank=True, null=True)
+    # Resized copies of `logo`, see apps.core.images
+    logo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     website = models.URLField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = BrandManager()
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='brand_name_trgm'),
+        ]
 
     def __str__(self):
         return self.name
@@ -64,9 +128,16 @@ class Brand(models.Model):
 
     @property
     def products_count(self):
+        # Prefer the value from BrandManager.with_products_count()
+        if hasattr(self, 'published_products_count'):
+            return self.published_products_count
         return self.products.filter(status='published').count()
 
 
+# Condition of the partial indexes for catalog reads
+PUBLISHED = models.Q(status='published')
+
+
 class Product(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -131,11 +202,25 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     is_bestseller = models.BooleanField(default=False)
     is_new = models.BooleanField(default=True)
+    # Detail page views over the last few days, see apps.products.popularity
+    popularity = models.PositiveIntegerField(default=0, editable=False)
     
     # SEO
     meta_title = models.CharField(max_length=200, blank=True, null=True)
     meta_description = models.TextField(blank=True, null=True)
     
+    # Rating aggregates (maintained incrementally by apps.reviews)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Full-text search document (maintained by products.signals)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -143,20 +228,86 @@ class Product(models.Model):
     objects = ProductManager()
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm'),
+            # Catalog reads only ever see published products, so their indexes
+            # leave drafts and archived products out. Each ends in the keyset
+            # pagination ordering ('-created_at', '-id' unless noted).
+            models.Index(
+                fields=['-created_at', '-id'], name='product_published_created', condition=PUBLISHED
+            ),
+            # ?sort=price / -price and price ranges
+            models.Index(fields=['price', 'id'], name='product_published_price', condition=PUBLISHED),
+            # ?sort=popularity
+            models.Index(
+                fields=['-popularity', '-id'], name='product_published_popularity', condition=PUBLISHED
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                name='product_published_category',
+                condition=PUBLISHED,
+            ),
+            models.Index(
+                fields=['brand', '-created_at', '-id'], name='product_published_brand', condition=PUBLISHED
+            ),
+            # featured(), bestsellers() and new_arrivals() select small slices
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='product_published_featured',
+                condition=PUBLISHED & models.Q(is_featured=True),
+            ),
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='product_published_bestseller',
+                condition=PUBLISHED & models.Q(is_bestseller=True),
+            ),
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='product_published_new',
+                condition=PUBLISHED & models.Q(is_new=True),
+            ),
+            # Matches ProductManager.low_stock(), which is a small slice of the catalog
+            models.Index(
+                fields=['quantity', 'id'],
+                name='product_low_stock',
+                condition=models.Q(
+                    track_quantity=True, status='published', quantity__lte=models.F('low_stock_threshold')
+                ),
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    # Saves attempted with a freshly allocated slug before a conflict is raised
+    SLUG_ATTEMPTS = 3
+    # Routes under products/ that would hide a product's detail page
+    RESERVED_SLUGS = frozenset({'autocomplete', 'batch', 'export', 'featured', 'import', 'stock'})
+
+    def clean(self):
+        if self.slug in self.RESERVED_SLUGS:
+            raise ValidationError({'slug': f'"{self.slug}" is reserved for another page.'})
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        
         # Set published_at when status changes to published
         if self.status == 'published' and not self.published_at:
             from django.utils import timezone
             self.published_at = timezone.now()
         
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        for attempt in range(self.SLUG_ATTEMPTS):
+            Product.objects.allocate_slugs([self])
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only a slug taken since it was allocated is worth another attempt
+                if attempt == self.SLUG_ATTEMPTS - 1 or not Product.objects.filter(slug=self.slug).exists():
+                    raise
+                self.slug = ''
 
     @property
     def in_stock(self):
@@ -178,16 +329,130 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        from django.db.models import Avg
-        result = self.reviews.filter(is_approved=True).aggregate(
-            avg_rating=Avg('rating')
-        )
-        return result['avg_rating'] or 0
+        if not self.rating_count:
+            return 0
+        return self.rating_sum / self.rating_count
 
     @property
     def review_count(self):
-        return self.reviews.filter(is_approved=True).count()
+        return self.rating_count
+
+    @property
+    def rating_distribution(self):
+        """Approved review count per star rating, read from the stored histogram"""
+        return {
+            rating: getattr(self, f'rating_{rating}_count')
+            for rating in range(1, 6)
+        }
+
+
+
+class LowStockProduct(Product):
+    """Published products at or below their low stock threshold, for the admin"""
+
+    class Meta:
+        proxy = True
+        verbose_name = 'Low stock product'
+        verbose_name_plural = 'Low stock products'
+
+
+class StockAlert(models.Model):
+    """A product dropping to a worse stock level; mailed to staff in a digest"""
+    LEVEL_CHOICES = [
+        ('low_stock', 'Low stock'),
+        ('out_of_stock', 'Out of stock'),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_alerts'
+    )
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                name='stock_alert_pending',
+                condition=models.Q(notified_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_level_display()}: {self.product.name} ({self.quantity})"
+
 
+class ProductPairCount(models.Model):
+    """
+    Sparse co-purchase matrix: the number of orders containing both products.
+    The diagonal (product == related) counts orders containing the product.
+    Maintained by apps.products.related.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='product_pair_count_unique'),
+        ]
+
+
+class RelatedProduct(models.Model):
+    """Top co-purchased products for each product, best match first"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='related_products',
+        db_index=False
+    )
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='purchased_with')
+    position = models.PositiveSmallIntegerField()
+    # Orders with both products / sqrt(orders with each), from 0 to 1
+    score = models.FloatField()
+    co_purchases = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'position'], name='related_product_position'),
+        ]
+
+
+class CoPurchaseRun(models.Model):
+    """A related products update; the latest one's orders_until is where the next starts"""
+    # Orders created up to this time were counted
+    orders_until = models.DateTimeField()
+    orders = models.PositiveIntegerField(default=0)
+    full = models.BooleanField(default=False)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-finished_at']
+
+
+class ProductViewCount(models.Model):
+    """Detail page views of a product on one day"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='view_counts', db_index=False)
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', '-views']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='product_view_count_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='product_view_count_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} on {self.date}: {self.views}"
 
 class ProductImage(models.Model):
     product = models.ForeignKey(
@@ -196,6 +461,8 @@ class ProductImage(models.Model):
         related_name='images'
     )
     image = models.ImageField(upload_to='products/')
+    # Resized copies of `image`, see apps.core.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=200, blank=True, null=True)
     is_primary = models.BooleanField(default=False)
     order = models.IntegerField(default=0)
@@ -216,4 +483,30 @@ class ProductImage(models.Model):
         super().save(*args, **kwargs)
 
 
+def primary_image_prefetch(lookup='images'):
+    """Prefetch only primary images into `primary_images` on each product.
+
+    `lookup` is the path to the product images relation, e.g.
+    'items__product__images' when products are nested inside cart items.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=ProductImage.objects.filter(is_primary=True),
+        to_attr='primary_images'
+    )
 
+
+def primary_image_annotation():
+    """Subquery returning the primary image as a JSON object, for single-query reads.
+
+    Annotate it as `primary_image_data`; serializers read it in place of
+    primary_image_prefetch() results.
+    """
+    return models.Subquery(
+        ProductImage.objects.filter(product=models.OuterRef('pk'), is_primary=True).values(
+            data=JSONObject(
+                id='id', image='image', alt_text='alt_text', is_primary='is_primary', order='order',
+                image_derivatives='image_derivatives',
+            )
+        )[:1]
+    )
@@ -0,0 +1,163 @@
+"""
+Buffered product view counts.
+
+Detail page views are counted in Redis (HINCRBY on one hash) or, when Redis
+isn't configured or can't be reached, in a per-process buffer that flushes
+itself every LOCAL_FLUSH_INTERVAL seconds. The flush_product_views task
+drains the buffer every minute into per-day ProductViewCount rows with one
+upsert per chunk, and adds the views to Product.popularity, the views over
+the last POPULARITY_DAYS days that ?sort=popularity reads. A daily task
+recomputes popularity so that old days drop out.
+
+Views are buffered by slug, so cached and 304 responses are counted without
+touching the database.
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Product, ProductViewCount
+
+VIEWS_KEY = 'nexus:product-views'
+POPULARITY_DAYS = 7
+LOCAL_FLUSH_INTERVAL = 60
+FLUSH_CHUNK_SIZE = 1000
+
+VIEW_COUNT_SQL = '''
+    WITH batch (product_id, date, views) AS (VALUES {values}),
+    counted AS (
+        INSERT INTO {view_count} AS counter (product_id, date, views)
+        SELECT product_id, date, views FROM batch
+        ON CONFLICT (product_id, date) DO UPDATE SET views = counter.views + EXCLUDED.views
+    )
+    UPDATE {product} AS product SET popularity = product.popularity + recent.views
+    FROM (
+        SELECT product_id, SUM(views) AS views FROM batch WHERE date >= %s GROUP BY product_id
+    ) AS recent
+    WHERE product.id = recent.product_id
+'''
+VIEW_COUNT_ROW = '(%s, %s::date, %s::integer)'
+
+POPULARITY_SQL = '''
+    UPDATE {product} AS product SET popularity = COALESCE(recent.views, 0)
+    FROM {product} AS current
+    LEFT JOIN (
+        SELECT product_id, SUM(views) AS views FROM {view_count}
+        WHERE date >= %s GROUP BY product_id
+    ) AS recent ON recent.product_id = current.id
+    WHERE product.id = current.id AND product.popularity <> COALESCE(recent.views, 0)
+'''
+
+
+class LocalBuffer:
+    """Thread-safe in-process counts, flushed from the request that finds them due"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def add(self, field):
+        with self.lock:
+            self.counts[field] += 1
+            due = time.monotonic() - self.flushed_at >= LOCAL_FLUSH_INTERVAL
+        if due:
+            flush_views()
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.flushed_at = time.monotonic()
+        return counts
+
+
+local_buffer = LocalBuffer()
+_redis = None
+
+
+def get_redis():
+    global _redis
+    if _redis is None and settings.REDIS_URL:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1)
+    return _redis
+
+
+def popularity_start():
+    """First day counted in Product.popularity"""
+    return timezone.now().date() - timedelta(days=POPULARITY_DAYS - 1)
+
+
+def record_view(slug):
+    field = f'{timezone.now().date().isoformat()}:{slug}'
+    client = get_redis()
+    if client is not None:
+        try:
+            client.hincrby(VIEWS_KEY, field, 1)
+            return
+        except redis.RedisError:
+            pass
+    local_buffer.add(field)
+
+
+def drain_redis():
+    client = get_redis()
+    if client is None:
+        return Counter()
+    # Move the hash aside first, so views recorded during the flush aren't lost
+    key = f'{VIEWS_KEY}:flushing:{uuid.uuid4().hex}'
+    try:
+        client.rename(VIEWS_KEY, key)
+    except redis.RedisError:
+        # Nothing buffered (no such key), or Redis is down and views went to the local buffer
+        return Counter()
+    counts = client.hgetall(key)
+    client.delete(key)
+    return Counter({field.decode(): int(views) for field, views in counts.items()})
+
+
+def flush_views():
+    """Write buffered views to the daily counters; return the number of views written"""
+    counts = drain_redis() + local_buffer.drain()
+    if not counts:
+        return 0
+
+    views = {}
+    for field, count in counts.items():
+        day, slug = field.split(':', 1)
+        views[date.fromisoformat(day), slug] = count
+    product_ids = dict(Product.objects.filter(
+        slug__in={slug for _, slug in views}
+    ).values_list('slug', 'pk'))
+    rows = [
+        (product_ids[slug], day, count)
+        for (day, slug), count in views.items() if slug in product_ids
+    ]
+
+    tables = {'view_count': ProductViewCount._meta.db_table, 'product': Product._meta.db_table}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), FLUSH_CHUNK_SIZE):
+            chunk = rows[start:start + FLUSH_CHUNK_SIZE]
+            cursor.execute(
+                VIEW_COUNT_SQL.format(values=', '.join([VIEW_COUNT_ROW] * len(chunk)), **tables),
+                [value for row in chunk for value in row] + [popularity_start()]
+            )
+    return sum(count for _, _, count in rows)
+
+
+def recompute_popularity():
+    """Recount Product.popularity from the daily counters in the window"""
+    tables = {'view_count': ProductViewCount._meta.db_table, 'product': Product._meta.db_table}
+    with connection.cursor() as cursor:
+        cursor.execute(POPULARITY_SQL.format(**tables), [popularity_start()])
+        updated = cursor.rowcount
+    if updated:
+        cache.bump('products')
+    return updated
@@ -0,0 +1,122 @@
+"""
+Read-only fast path for hot product list endpoints.
+
+Builds the same dicts as ProductListSerializer straight from values() rows,
+without instantiating models or going through per-field serializer
+machinery. Computed fields reuse the Product property code, so the two
+paths can't drift apart.
+"""
+from operator import attrgetter
+from types import SimpleNamespace
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from apps.core.images import derivative_urls
+from apps.core.serializers import EXPAND_PARAM, FIELDS_PARAM, requested_fields
+from .models import Product, ProductImage
+from .serializers import ProductListSerializer
+
+LIST_FIELDS = ProductListSerializer.Meta.fields
+
+_decimal = serializers.DecimalField(max_digits=10, decimal_places=2)
+_datetime = serializers.DateTimeField()
+
+
+def _format_decimal(value):
+    return None if value is None else _decimal.to_representation(value)
+
+
+def _primary_image(data):
+    # Same keys and order as ProductImageSerializer
+    if not data:
+        return None
+    storage = ProductImage._meta.get_field('image').storage
+    return {
+        'id': data['id'],
+        'image': storage.url(data['image']) if data['image'] else None,
+        'srcset': derivative_urls(data['image'], data['image_derivatives'], storage),
+        'alt_text': data['alt_text'],
+        'is_primary': data['is_primary'],
+        'order': data['order'],
+    }
+
+
+# Output field -> reader of a row namespace; other fields are read as-is
+FIELD_READERS = {
+    'price': lambda row: _format_decimal(row.price),
+    'compare_price': lambda row: _format_decimal(row.compare_price),
+    'category_name': attrgetter('category__name'),
+    'brand_name': attrgetter('brand__name'),
+    'primary_image': lambda row: _primary_image(row.primary_image_data),
+    'average_rating': Product.average_rating.fget,
+    'review_count': Product.review_count.fget,
+    'discount_percentage': Product.discount_percentage.fget,
+    'in_stock': Product.in_stock.fget,
+    'created_at': lambda row: _datetime.to_representation(row.created_at),
+}
+
+# Output fields dropped when their relation is null, as the serializer does
+RELATION_FIELDS = {'category_name': 'category', 'brand_name': 'brand'}
+
+
+def list_fields(request):
+    """ProductListSerializer fields selected by ?fields=, in schema order"""
+    selected = requested_fields(request, FIELDS_PARAM)
+    if selected is None:
+        return LIST_FIELDS
+    selected.update(ProductListSerializer.always_included_fields)
+    return [name for name in LIST_FIELDS if name in selected]
+
+
+def product_rows(queryset, fields):
+    """
+    values() rows with the columns `fields` read.
+
+    `queryset` comes from ProductListSerializer.optimize_queryset(), which
+    annotates the primary image when it is requested.
+    """
+    columns = {
+        name.lstrip('-') for name in queryset.query.order_by or Product._meta.ordering
+        if name.lstrip('-') not in queryset.query.annotations
+    }
+    for name in fields:
+        columns.update(ProductListSerializer.field_dependencies.get(name, [name]))
+    if 'primary_image' in fields:
+        columns.add('primary_image_data')
+    return queryset.values(*columns)
+
+
+def serialize_products(rows, fields):
+    readers = [(name, FIELD_READERS.get(name, attrgetter(name))) for name in fields]
+    nullable = [(name, relation) for name, relation in RELATION_FIELDS.items() if name in fields]
+
+    data = []
+    for row in rows:
+        row = SimpleNamespace(**row)
+        product = {name: read(row) for name, read in readers}
+        for name, relation in nullable:
+            if getattr(row, relation) is None:
+                del product[name]
+        data.append(product)
+    return data
+
+
+class ProductRowsListMixin:
+    """
+    List view mixin that serializes products from values() rows.
+
+    ?expand= needs nested serializers, so it goes through the regular
+    serializer path.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(EXPAND_PARAM):
+            return super().list(request, *args, **kwargs)
+
+        fields = list_fields(request)
+        rows = product_rows(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_products(page, fields))
+        return Response(serialize_products(rows, fields))
@@ -0,0 +1,151 @@
+"""
+"Frequently bought together" from order history.
+
+Co-purchases are counted inside PostgreSQL rather than in Python: each batch
+of orders is turned into (product, related, orders) pair counts with one
+grouped self-join of its de-duplicated baskets and added to the sparse
+ProductPairCount matrix with INSERT ... ON CONFLICT. Memory use on the
+worker is constant however many order lines there are, and the database
+sorts one batch at a time.
+
+The top RELATED_LIMIT neighbours of each product are then re-ranked into
+RelatedProduct by cosine similarity, co / sqrt(orders(a) * orders(b)), so
+bestsellers don't crowd out genuinely related items. Incremental runs only
+read orders placed since the last run and only re-rank the products in
+them; a full run rebuilds everything.
+
+Runs pick orders by created_at, not by id: ids are handed out before an
+order's transaction commits, so an order with a lower id than one already
+counted can still appear. Each run counts orders created up to
+ORDER_SETTLE_TIME ago, which is assumed to be long enough for any order
+transaction to commit, and the next run starts from that cutoff.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from . import cache
+from .models import CoPurchaseRun, ProductPairCount, RelatedProduct
+
+RELATED_LIMIT = 10
+# Fewer shared orders than this is noise
+MIN_CO_PURCHASES = 2
+# Orders with more distinct products (e.g. wholesale) are skipped; pairs grow quadratically
+MAX_BASKET_SIZE = 50
+ORDER_BATCH_SIZE = 20000
+# Orders created more recently than this may not be committed yet
+ORDER_SETTLE_TIME = timedelta(minutes=10)
+EXCLUDED_ORDER_STATUSES = ['cancelled', 'refunded']
+
+PAIR_COUNT_SQL = '''
+    WITH basket AS (
+        SELECT DISTINCT item.order_id, item.product_id
+        FROM {order_item} AS item
+        JOIN {order} AS o ON o.id = item.order_id
+        WHERE item.order_id >= %(start)s AND item.order_id < %(end)s
+            AND o.created_at > %(since)s AND o.created_at <= %(until)s
+            AND NOT (o.status = ANY(%(excluded_statuses)s))
+    ),
+    counted AS (
+        SELECT order_id FROM basket GROUP BY order_id HAVING COUNT(*) <= %(max_basket_size)s
+    )
+    INSERT INTO {pair_count} AS pair (product_id, related_id, count)
+    SELECT a.product_id, b.product_id, COUNT(*)
+    FROM basket AS a
+    JOIN basket AS b ON b.order_id = a.order_id
+    WHERE a.order_id IN (SELECT order_id FROM counted)
+    GROUP BY a.product_id, b.product_id
+    ON CONFLICT (product_id, related_id) DO UPDATE SET count = pair.count + EXCLUDED.count
+'''
+
+# Products whose neighbours are re-ranked; all of them on a full run
+CHANGED_PRODUCTS = '''
+    SELECT DISTINCT item.product_id FROM {order_item} AS item
+    JOIN {order} AS o ON o.id = item.order_id
+    WHERE o.created_at > %(since)s AND o.created_at <= %(until)s
+'''
+
+RANK_SQL = '''
+    INSERT INTO {related_product} (product_id, related_id, position, score, co_purchases)
+    SELECT product_id, related_id, position, score, co_purchases FROM (
+        SELECT pair.product_id, pair.related_id, pair.count AS co_purchases,
+            pair.count / sqrt(a.count::float * b.count) AS score,
+            row_number() OVER (
+                PARTITION BY pair.product_id
+                ORDER BY pair.count / sqrt(a.count::float * b.count) DESC, pair.related_id
+            ) AS position
+        FROM {pair_count} AS pair
+        JOIN {pair_count} AS a ON a.product_id = pair.product_id AND a.related_id = pair.product_id
+        JOIN {pair_count} AS b ON b.product_id = pair.related_id AND b.related_id = pair.related_id
+        WHERE pair.product_id <> pair.related_id AND pair.count >= %(min_co_purchases)s
+            {changed}
+    ) AS ranked
+    WHERE position <= %(limit)s
+'''
+
+
+def _tables():
+    return {
+        'order': apps.get_model('orders', 'Order')._meta.db_table,
+        'order_item': apps.get_model('orders', 'OrderItem')._meta.db_table,
+        'pair_count': ProductPairCount._meta.db_table,
+        'related_product': RelatedProduct._meta.db_table,
+    }
+
+
+def update_related_products(full=False, batch_size=ORDER_BATCH_SIZE):
+    """
+    Add orders placed since the last run (or, with `full`, all orders) to the
+    co-purchase counts and re-rank the affected products. Returns the run, or
+    None if there were no new orders.
+    """
+    Order = apps.get_model('orders', 'Order')
+    tables = _tables()
+    started = time.monotonic()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # One run at a time; readers keep seeing the previous results until commit
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('related_products'))")
+
+        since = datetime.min
+        if full:
+            ProductPairCount.objects.all().delete()
+        else:
+            since = CoPurchaseRun.objects.order_by('-pk').values_list('orders_until', flat=True).first() or since
+        until = timezone.now() - ORDER_SETTLE_TIME
+        orders = Order.objects.filter(created_at__gt=since, created_at__lte=until).aggregate(
+            count=Count('pk'), first=Min('pk'), last=Max('pk')
+        )
+        if not orders['count']:
+            return None
+
+        for batch_start in range(orders['first'], orders['last'] + 1, batch_size):
+            cursor.execute(PAIR_COUNT_SQL.format(**tables), {
+                'start': batch_start,
+                'end': batch_start + batch_size,
+                'since': since,
+                'until': until,
+                'excluded_statuses': EXCLUDED_ORDER_STATUSES,
+                'max_basket_size': MAX_BASKET_SIZE,
+            })
+
+        params = {'since': since, 'until': until, 'min_co_purchases': MIN_CO_PURCHASES, 'limit': RELATED_LIMIT}
+        if full:
+            RelatedProduct.objects.all().delete()
+            changed = ''
+        else:
+            changed_products = CHANGED_PRODUCTS.format(**tables)
+            cursor.execute(
+                f'DELETE FROM {tables["related_product"]} WHERE product_id IN ({changed_products})', params
+            )
+            changed = f'AND pair.product_id IN ({changed_products})'
+        cursor.execute(RANK_SQL.format(changed=changed, **tables), params)
+
+        run = CoPurchaseRun.objects.create(orders_until=until, orders=orders['count'], full=full)
+    cache.bump('related-products')
+    run.elapsed = time.monotonic() - started
+    return run
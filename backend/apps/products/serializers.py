@@ -1,14 +1,16 @@
 from rest_framework import serializers
-from .models import Category, Brand, Product, ProductImage
+from apps.core.serializers import ImageDerivativesField, SparseFieldsetMixin
+from .models import Category, Brand, Product, ProductImage, primary_image_annotation
 
 
 class CategorySerializer(serializers.ModelSerializer):
     products_count = serializers.ReadOnlyField()
+    image_srcset = ImageDerivativesField('image')
 
     class Meta:
         model = Category
         fields = [
-            'id', 'name', 'slug', 'description', 'parent', 'image',
+            'id', 'name', 'slug', 'description', 'parent', 'image', 'image_srcset',
             'is_active', 'meta_title', 'meta_description', 
             'products_count', 'created_at', 'updated_at'
         ]
@@ -17,23 +19,38 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class BrandSerializer(serializers.ModelSerializer):
     products_count = serializers.ReadOnlyField()
+    logo_srcset = ImageDerivativesField('logo')
 
     class Meta:
         model = Brand
         fields = [
-            'id', 'name', 'slug', 'description', 'logo', 'website',
+            'id', 'name', 'slug', 'description', 'logo', 'logo_srcset', 'website',
             'is_active', 'products_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = ImageDerivativesField('image')
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary', 'order']
+        fields = ['id', 'image', 'srcset', 'alt_text', 'is_primary', 'order']
+
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug']
+
+
+class BrandSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Brand
+        fields = ['id', 'name', 'slug']
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
@@ -51,8 +68,63 @@ class ProductListSerializer(serializers.ModelSerializer):
             'is_featured', 'is_bestseller', 'is_new', 'status', 'created_at'
         ]
 
+    expandable_fields = {
+        'category': (CategorySummarySerializer, {}),
+        'brand': (BrandSummarySerializer, {}),
+        'images': (ProductImageSerializer, {'many': True}),
+    }
+
+    # Model fields read by output fields that aren't model fields themselves
+    field_dependencies = {
+        'category_name': ['category__name'],
+        'brand_name': ['brand__name'],
+        'primary_image': [],
+        'average_rating': ['rating_sum', 'rating_count'],
+        'review_count': ['rating_count'],
+        'discount_percentage': ['price', 'compare_price'],
+        'in_stock': ['track_quantity', 'quantity'],
+    }
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """
+        Narrow a product queryset to what the requested fields read: only()
+        the columns needed, join only the relations shown, and load the
+        primary image in the same query only when it is asked for.
+        """
+        fields = cls(context={'request': request}).fields
+        # Keys for cache scopes, plus ordering columns read by the paginator
+        # (annotations such as the search rank are selected anyway)
+        columns = {'category', 'brand'}
+        columns.update(
+            name.lstrip('-') for name in queryset.query.order_by or Product._meta.ordering
+            if name.lstrip('-') not in queryset.query.annotations
+        )
+        related = set()
+        for name, field in fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                queryset = queryset.prefetch_related(name)
+            elif isinstance(field, serializers.BaseSerializer):
+                related.add(name)
+                columns.update(f'{name}__{nested}' for nested in field.fields)
+            else:
+                columns.update(cls.field_dependencies.get(name, [name]))
+        related.update(column.split('__')[0] for column in columns if '__' in column)
+
+        if 'primary_image' in fields:
+            queryset = queryset.annotate(primary_image_data=primary_image_annotation())
+        return queryset.select_related(*related).only(*columns)
+
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        # Use primary_image_annotation() or the batched primary_image_prefetch()
+        # results when available
+        if hasattr(obj, 'primary_image_data'):
+            data = obj.primary_image_data
+            primary_image = ProductImage(**data) if data else None
+        elif hasattr(obj, 'primary_images'):
+            primary_image = obj.primary_images[0] if obj.primary_images else None
+        else:
+            primary_image = obj.images.filter(is_primary=True).first()
         if primary_image:
             return ProductImageSerializer(primary_image).data
         return None
@@ -77,3 +149,71 @@ class ProductDetailSerializer(ProductListSerializer):
         ]
 
 
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    One row of a product feed, validated without touching the database.
+
+    Category and brand are given by slug and resolved through the
+    `categories` / `brands` {slug: id} maps passed in the context.
+    """
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=200, required=False)
+    slug = serializers.SlugField(max_length=200, required=False)
+    description = serializers.CharField(required=False)
+    short_description = serializers.CharField(max_length=500, required=False, allow_null=True, allow_blank=True)
+    category = serializers.SlugField(required=False, allow_null=True)
+    brand = serializers.SlugField(required=False, allow_null=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    compare_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    cost_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    barcode = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+    track_quantity = serializers.BooleanField(required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    low_stock_threshold = serializers.IntegerField(min_value=0, required=False)
+    weight = serializers.DecimalField(max_digits=8, decimal_places=2, required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Product.STATUS_CHOICES, required=False)
+    is_featured = serializers.BooleanField(required=False)
+    is_bestseller = serializers.BooleanField(required=False)
+    is_new = serializers.BooleanField(required=False)
+    meta_title = serializers.CharField(max_length=200, required=False, allow_null=True, allow_blank=True)
+    meta_description = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    def validate_slug(self, value):
+        if value in Product.RESERVED_SLUGS:
+            raise serializers.ValidationError(f'"{value}" is reserved for another page.')
+        return value
+
+    def validate_category(self, value):
+        return self.resolve_slug('categories', value, 'Unknown category.')
+
+    def validate_brand(self, value):
+        return self.resolve_slug('brands', value, 'Unknown brand.')
+
+    def resolve_slug(self, name, value, message):
+        if value is None:
+            return None
+        try:
+            return self.context[name][value]
+        except KeyError:
+            raise serializers.ValidationError(message)
+
+
+class StockUpdateSerializer(serializers.Serializer):
+    """One row of a bulk price/inventory update; omitted fields are left unchanged"""
+    sku = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    compare_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError('Provide price, compare_price or quantity.')
+        return attrs
@@ -1,31 +1,21 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.utils.text import slugify
-from .models import Product, ProductImage
-
-@receiver(pre_save, sender=Product)
-def update_product_slug(sender, instance, **kwargs):
-    """Auto-generate slug from product name if not provided"""
-    if not instance.slug:
-        base_slug = slugify(instance.name)
-        slug = base_slug
-        counter = 1
-        while Product.objects.filter(slug=slug).exists():
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-        instance.slug = slug
-
-@receiver(pre_save, sender=Product)
-def check_low_stock_alert(sender, instance, **kwargs):
-    """Check if stock is low and print alert"""
-    if (instance.track_quantity and 
-        instance.quantity <= instance.low_stock_threshold and 
-        instance.quantity > 0):
-        print(f"⚠️ Low stock alert for {instance.name}: {instance.quantity} remaining")
-
-@receiver(pre_save, sender=Product)
+from apps.core import images
+from . import alerts, cache
+from .models import Brand, Category, Product, ProductImage
+
+# Product receivers are connected without a sender and check it themselves, so
+# saves through proxies such as LowStockProduct (the restocking changelist)
+# reach them too
+
+# Product fields that feed the full-text search document
+SEARCH_FIELDS = {'name', 'description', 'short_description', 'category', 'category_id', 'brand', 'brand_id'}
+
+@receiver(pre_save)
 def handle_published_status(sender, instance, **kwargs):
     """Handle published_at timestamp when status changes to published"""
+    if not issubclass(sender, Product):
+        return
     if instance.status == 'published' and not instance.published_at:
         from django.utils import timezone
         instance.published_at = timezone.now()
@@ -40,4 +30,119 @@ def ensure_single_primary_image(sender, instance, **kwargs):
         ProductImage.objects.filter(
             product=instance.product, 
             is_primary=True
-        ).exclude(pk=instance.pk).update(is_primary=False)
\ No newline at end of file
+        ).exclude(pk=instance.pk).update(is_primary=False)
+
+@receiver(post_save)
+def update_product_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Rebuild the product search document after its text fields change"""
+    if not issubclass(sender, Product):
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    Product.objects.update_search_vectors([instance.pk])
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Brand)
+def track_name_change(sender, instance, **kwargs):
+    """Remember whether a category or brand is being renamed"""
+    instance._name_changed = bool(instance.pk) and sender.objects.filter(
+        pk=instance.pk
+    ).exclude(name=instance.name).exists()
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def reindex_products_on_rename(sender, instance, **kwargs):
+    """Category and brand names are part of the product search document"""
+    if getattr(instance, '_name_changed', False):
+        Product.objects.update_search_vectors(
+            instance.products.values_list('pk', flat=True)
+        )
+
+@receiver(pre_save)
+def remember_previous_state(sender, instance, **kwargs):
+    """
+    Keep the stored category, brand and status, so cached responses and
+    category counts for both are invalidated, and the stored quantity, for
+    stock alerts
+    """
+    if not issubclass(sender, Product):
+        return
+    instance._previous_relations = ()
+    instance._previous_status = None
+    instance._previous_quantity = None
+    if instance.pk:
+        category_id, brand_id, status, quantity = Product.objects.filter(pk=instance.pk).values_list(
+            'category_id', 'brand_id', 'status', 'quantity'
+        ).first() or (None, None, None, None)
+        instance._previous_relations = (category_id, brand_id)
+        instance._previous_status = status
+        instance._previous_quantity = quantity
+
+@receiver(post_save)
+def record_stock_alerts(sender, instance, created, **kwargs):
+    """Alert when a save drops the product to low or out of stock"""
+    if not issubclass(sender, Product):
+        return
+    previous_quantity = getattr(instance, '_previous_quantity', None)
+    if created or previous_quantity is None or previous_quantity == instance.quantity:
+        return
+    alerts.record_transitions([{
+        'id': instance.pk,
+        'quantity': instance.quantity,
+        'previous_quantity': previous_quantity,
+        'low_stock_threshold': instance.low_stock_threshold,
+        'track_quantity': instance.track_quantity,
+    }])
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_product_cache(sender, instance, created=True, **kwargs):
+    """
+    Product lists and the product itself may have changed; category and
+    brand product counts only when a product is created, deleted, published
+    or unpublished, or moved to another category or brand
+    """
+    if not issubclass(sender, Product):
+        return
+    previous_category, previous_brand = getattr(instance, '_previous_relations', None) or (None, None)
+    scopes = {'products', f'product:{instance.pk}'}
+    # Creates and deletes (post_delete sends no `created`) change counts too
+    if created or getattr(instance, '_previous_status', None) != instance.status or (
+        (previous_category, previous_brand) != (instance.category_id, instance.brand_id)
+    ):
+        # Ancestor categories count this product as well
+        categories = Category.objects.ancestor_ids({instance.category_id, previous_category})
+        scopes.update({'categories', 'brands'})
+        scopes.update(f'category:{pk}' for pk in categories if pk)
+        scopes.update(f'brand:{pk}' for pk in (instance.brand_id, previous_brand) if pk)
+    cache.bump(*scopes)
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(images.derivatives_generated, sender=ProductImage)
+def invalidate_product_image_cache(sender, instance, **kwargs):
+    cache.bump(f'product:{instance.product_id}')
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(images.derivatives_generated, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """Category names and paths show up in, and filter, product lists"""
+    cache.bump('categories', f'category:{instance.pk}', 'products')
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(images.derivatives_generated, sender=Brand)
+def invalidate_brand_cache(sender, instance, **kwargs):
+    """Brand names show up in, and are searched by, product lists"""
+    cache.bump('brands', f'brand:{instance.pk}', 'products')
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def queue_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    """Render thumbnails and responsive widths of a new upload in the background"""
+    images.queue_derivatives(instance, 'image', update_fields)
+
+@receiver(post_save, sender=Brand)
+def queue_logo_derivatives(sender, instance, update_fields=None, **kwargs):
+    images.queue_derivatives(instance, 'logo', update_fields)
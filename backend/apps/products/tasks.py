@@ -0,0 +1,77 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from . import flags, popularity, related
+from .models import StockAlert
+
+logger = logging.getLogger(__name__)
+
+
+def stock_alert_recipients():
+    """STOCK_ALERT_RECIPIENTS, or the active superusers' addresses"""
+    if settings.STOCK_ALERT_RECIPIENTS:
+        return settings.STOCK_ALERT_RECIPIENTS
+    return list(get_user_model().objects.filter(
+        is_superuser=True, is_active=True
+    ).values_list('email', flat=True))
+
+
+@shared_task(ignore_result=True)
+def send_stock_alert_digest():
+    """Mail all pending stock alerts in one message"""
+    with transaction.atomic():
+        # Skip alerts another digest run is already sending
+        alerts = list(
+            StockAlert.objects.filter(notified_at__isnull=True)
+            .select_related('product')
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('level', 'product__name')
+        )
+        if not alerts:
+            return
+
+        lines = [
+            f"- {alert.get_level_display()}: {alert.product.name} (SKU {alert.product.sku}), "
+            f"{alert.quantity} left"
+            for alert in alerts
+        ]
+        recipients = stock_alert_recipients()
+        if recipients:
+            send_mail(
+                f'Stock alert: {len(alerts)} product(s) need restocking',
+                '\n'.join(lines),
+                settings.DEFAULT_FROM_EMAIL,
+                recipients,
+            )
+        else:
+            logger.warning('No stock alert recipients; pending alerts:\n%s', '\n'.join(lines))
+        StockAlert.objects.filter(pk__in=[alert.pk for alert in alerts]).update(notified_at=timezone.now())
+
+
+@shared_task(ignore_result=True)
+def update_related_products(full=False):
+    """Fold new orders (or, with `full`, all orders) into the related products"""
+    related.update_related_products(full=full)
+
+
+@shared_task(ignore_result=True)
+def update_product_flags():
+    """Recompute bestsellers from recent sales and expire new arrivals"""
+    flags.update_product_flags()
+
+
+@shared_task(ignore_result=True)
+def flush_product_views():
+    """Write buffered product views to the daily counters"""
+    popularity.flush_views()
+
+
+@shared_task(ignore_result=True)
+def recompute_product_popularity():
+    popularity.recompute_popularity()
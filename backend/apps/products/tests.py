@@ -1,3 +1,1167 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.models import User
+from apps.core import images
+from apps.core.tasks import generate_image_derivatives
+from apps.orders.models import Order, OrderItem
+from . import flags, popularity, related
+from .cache import get_versions, set_versions
+from .importer import ProductImporter
+from .models import Brand, Category, Product, ProductImage, ProductPairCount, ProductViewCount, RelatedProduct, StockAlert
+from .serializers import ProductImageSerializer, ProductListSerializer
+from .tasks import send_stock_alert_digest
+from .views import ProductDetailView
+
+
+class ProductListQueryTests(TestCase):
+    def setUp(self):
+        for index in range(5):
+            product = Product.objects.create(
+                name=f'Product {index}', slug=f'product-{index}', description='Description',
+                price=10 + index, status='published'
+            )
+            ProductImage.objects.create(product=product, image=f'products/{index}.jpg', is_primary=True)
+            ProductImage.objects.create(product=product, image=f'products/{index}-alt.jpg')
+
+    def test_primary_images_are_loaded_with_the_page(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product-list'), {'cursor': ''})
+
+        self.assertEqual(response.status_code, 200)
+        for product in response.data['results']:
+            self.assertTrue(product['primary_image']['is_primary'])
+
+    def test_sparse_fieldset_narrows_output_and_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('product-list'), {'fields': 'id,name,price,primary_image', 'cursor': ''}
+            )
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertNotIn('"description"', queries[0]['sql'])
+        product = response.data['results'][0]
+        self.assertEqual(list(product), ['id', 'name', 'price', 'primary_image'])
+        self.assertTrue(product['primary_image']['image'].endswith('products/4.jpg'))
+
+    def test_expand_nests_related_objects(self):
+        category = Category.objects.create(name='Lamps', slug='lamps')
+        Product.objects.update(category=category)
+        cache.clear()
+
+        response = self.client.get(reverse('product-list'), {'fields': 'name', 'expand': 'category'})
+        product = response.data['results'][0]
+        self.assertEqual(product['category'], {'id': category.pk, 'name': 'Lamps', 'slug': 'lamps'})
+        self.assertEqual(set(product), {'id', 'name', 'category'})
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        Product.objects.create(
+            name='Blue Running Shirt', slug='blue-running-shirt',
+            description='Lightweight', price=30, status='published'
+        )
+        Product.objects.create(
+            name='Trail Shoe', slug='trail-shoe', category=self.shirts,
+            description='Pairs well with a blue jacket', price=80, status='published'
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('product-list'), params)
+        return [product['slug'] for product in response.data['results']]
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        self.assertEqual(
+            self.search(search='blu', sort='relevance'),
+            ['blue-running-shirt', 'trail-shoe']
+        )
+
+    def test_category_rename_reindexes_products(self):
+        self.assertEqual(self.search(search='tops'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirts.name = 'Tops'
+            self.shirts.save()
+        self.assertEqual(self.search(search='tops'), ['trail-shoe'])
+
+
+class ProductAutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        brand = Brand.objects.create(name='Runwell', slug='runwell')
+        Product.objects.create(
+            name='Blue Running Shirt', slug='blue-running-shirt', brand=brand,
+            description='Lightweight', price=30, status='published'
+        )
+        Product.objects.create(
+            name='Running Draft', slug='running-draft', description='Unreleased', price=30
+        )
+
+    def test_typo_tolerant_suggestions(self):
+        response = self.client.get(reverse('product-autocomplete'), {'q': '  RUNING '})
+
+        self.assertEqual(response.data['query'], 'runing')
+        self.assertEqual([p['slug'] for p in response.data['products']], ['blue-running-shirt'])
+        self.assertEqual(response.data['categories'], [])
+
+    def test_short_queries_skip_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product-autocomplete'), {'q': 'r'})
+        self.assertEqual(response.data['products'], [])
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        acme = Brand.objects.create(name='Acme', slug='acme')
+        shoes = Category.objects.create(name='Shoes', slug='shoes')
+        for index, price in enumerate([10, 30, 30, 300]):
+            Product.objects.create(
+                name=f'Shoe {index}', slug=f'shoe-{index}', description='Shoe',
+                category=shoes, brand=acme if index else None, price=price,
+                quantity=10 if index else 0, status='published'
+            )
+
+    def test_facets_are_counted_in_one_query(self):
+        # count, page (with primary images) + facets
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('product-list'), {'facets': 'brand,price,stock,category'}
+            )
+
+        facets = response.data['facets']
+        self.assertEqual(facets['brand'], [{'value': 'acme', 'label': 'Acme', 'count': 3}])
+        self.assertEqual(facets['category'][0]['count'], 4)
+        self.assertEqual(
+            [(bucket['value'], bucket['count']) for bucket in facets['price']],
+            [('0-25', 1), ('25-50', 2), ('250+', 1)]
+        )
+        self.assertEqual(
+            {item['value']: item['count'] for item in facets['stock']},
+            {'in_stock': 3, 'out_of_stock': 1}
+        )
+
+    def test_facets_follow_filters(self):
+        response = self.client.get(reverse('product-list'), {'facets': 'price', 'max_price': 50})
+        self.assertEqual(sum(bucket['count'] for bucket in response.data['facets']['price']), 3)
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clothing = Category.objects.create(name='Clothing', slug='clothing')
+        self.men = Category.objects.create(name='Men', slug='men', parent=self.clothing)
+        self.shirts = Category.objects.create(name='Shirts', slug='shirts', parent=self.men)
+        self.sale = Category.objects.create(name='Sale', slug='sale')
+        Product.objects.create(
+            name='Oxford Shirt', slug='oxford-shirt', description='Shirt',
+            category=self.shirts, price=40, status='published'
+        )
+
+    def category_products(self, slug):
+        response = self.client.get(reverse('product-list'), {'category': slug})
+        return [product['slug'] for product in response.data['results']]
+
+    def test_category_filter_includes_all_descendants(self):
+        self.assertEqual(self.shirts.path, f'{self.clothing.pk}/{self.men.pk}/{self.shirts.pk}/')
+        self.assertEqual(self.category_products('clothing'), ['oxford-shirt'])
+        self.assertEqual(self.category_products('sale'), [])
+
+    def test_moving_a_category_moves_its_subtree(self):
+        self.men.parent = self.sale
+        self.men.save()
+
+        self.shirts.refresh_from_db()
+        self.assertEqual(self.shirts.path, f'{self.sale.pk}/{self.men.pk}/{self.shirts.pk}/')
+        self.assertEqual(self.category_products('sale'), ['oxford-shirt'])
+        self.assertEqual(self.category_products('clothing'), [])
+
+        with self.assertRaises(ValueError):
+            self.men.parent = self.shirts
+            self.men.save()
+
+    def test_tree_endpoint_is_nested_and_cached(self):
+        response = self.client.get(reverse('category-tree'))
+        self.assertEqual([node['slug'] for node in response.data], ['clothing', 'sale'])
+        self.assertEqual(response.data[0]['children'][0]['children'][0]['slug'], 'shirts')
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('category-tree'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Accessories', slug='accessories')
+        response = self.client.get(reverse('category-tree'))
+        self.assertEqual(response.data[0]['slug'], 'accessories')
+
+
+class ProductCountTests(TestCase):
+    def setUp(self):
+        clothing = Category.objects.create(name='Clothing', slug='clothing')
+        shirts = Category.objects.create(name='Shirts', slug='shirts', parent=clothing)
+        Category.objects.create(name='Hats', slug='hats', parent=clothing)
+        acme = Brand.objects.create(name='Acme', slug='acme')
+        Brand.objects.create(name='Zeta', slug='zeta')
+        for index, (category, status) in enumerate([
+            (clothing, 'published'), (shirts, 'published'), (shirts, 'published'), (shirts, 'draft')
+        ]):
+            Product.objects.create(
+                name=f'Item {index}', slug=f'item-{index}', description='Item',
+                category=category, brand=acme, price=10, status=status
+            )
+
+    def test_category_counts_include_descendants(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('category-list'))
+
+        counts = {category['slug']: category['products_count'] for category in response.data['results']}
+        self.assertEqual(counts, {'clothing': 3, 'hats': 0, 'shirts': 2})
+        self.assertEqual(Category.objects.get(slug='clothing').products_count, 3)
+
+    def test_category_counts_are_aggregated_once_per_statement(self):
+        sql, params = Category.objects.with_products_count().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        # An InitPlan runs once; a correlated SubPlan would run per category
+        self.assertIn('InitPlan', plan)
+        self.assertNotIn('SubPlan', plan)
+
+    def test_product_changes_invalidate_ancestor_counts(self):
+        cache.clear()
+        url = reverse('product-detail', args=['item-0'])
+        self.assertEqual(self.client.get(url).data['category_details']['products_count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = Product.objects.get(slug='item-3')
+            draft.status = 'published'
+            draft.save()
+        self.assertEqual(self.client.get(url).data['category_details']['products_count'], 4)
+
+    def test_brand_counts_use_one_grouped_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('brand-list'))
+
+        counts = {brand['slug']: brand['products_count'] for brand in response.data['results']}
+        self.assertEqual(counts, {'acme': 3, 'zeta': 0})
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for index in range(5):
+            Product.objects.create(
+                name=f'Lamp {index}', slug=f'lamp-{index}', description='Lamp',
+                price=10 * (index % 2), status='published'
+            )
+        # Force ties on the leading sort key so the id tie-breaker matters
+        Product.objects.update(created_at=Product.objects.first().created_at)
+
+    def walk(self, params):
+        slugs = []
+        response = self.client.get(reverse('product-list'), {'page_size': 2, 'cursor': '', **params})
+        while True:
+            self.assertNotIn('count', response.data)
+            slugs += [product['slug'] for product in response.data['results']]
+            if not response.data['next']:
+                return slugs
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_walks_every_row_once(self):
+        newest = self.walk({})
+        self.assertEqual(newest, [f'lamp-{index}' for index in reversed(range(5))])
+
+        by_price = self.walk({'sort': 'price'})
+        self.assertEqual(by_price, ['lamp-0', 'lamp-2', 'lamp-4', 'lamp-1', 'lamp-3'])
+
+    def test_page_numbers_are_the_default(self):
+        response = self.client.get(reverse('product-list'), {'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('cursor=', response.data['next'])
+
+        response = self.client.get(reverse('product-list'), {'page': 2, 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_cursor_is_bound_to_its_ordering(self):
+        response = self.client.get(reverse('product-list'), {'page_size': 2, 'cursor': ''})
+        cursor = response.data['next'].split('cursor=')[1]
+        response = self.client.get(reverse('product-list'), {'sort': 'price', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        self.hats = Category.objects.create(name='Hats', slug='hats')
+        self.shirt = Product.objects.create(
+            name='Oxford Shirt', slug='oxford-shirt', description='Shirt',
+            category=self.shirts, price=40, status='published'
+        )
+        self.hat = Product.objects.create(
+            name='Wool Hat', slug='wool-hat', description='Hat',
+            category=self.hats, price=20, status='published'
+        )
+
+    def test_cached_list_is_served_without_queries(self):
+        self.client.get(reverse('product-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_product_change_invalidates_list_and_detail(self):
+        self.client.get(reverse('product-list'))
+        self.client.get(reverse('product-detail', args=['oxford-shirt']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.price = 45
+            self.shirt.save()
+
+        response = self.client.get(reverse('product-detail', args=['oxford-shirt']))
+        self.assertEqual(response.data['price'], '45.00')
+        response = self.client.get(reverse('product-list'))
+        prices = {product['slug']: product['price'] for product in response.data['results']}
+        self.assertEqual(prices['oxford-shirt'], '45.00')
+
+    def test_versions_change_when_the_write_commits(self):
+        scope = f'product:{self.shirt.pk}'
+        before = get_versions([scope])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.price = 45
+            self.shirt.save()
+            # A read inside the transaction still caches under the old version
+            self.assertEqual(get_versions([scope]), before)
+        self.assertNotEqual(get_versions([scope]), before)
+
+    def test_change_committed_while_building_is_not_cached(self):
+        get_object = ProductDetailView.get_object
+
+        def read_then_commit_change(view):
+            product = get_object(view)
+            Product.objects.filter(pk=product.pk).update(price=45)
+            set_versions([f'product:{product.pk}'])
+            return product
+
+        url = reverse('product-detail', args=['oxford-shirt'])
+        with mock.patch.object(ProductDetailView, 'get_object', autospec=True, side_effect=read_then_commit_change):
+            response = self.client.get(url)
+        self.assertEqual(response.data['price'], '40.00')
+        self.assertEqual(self.client.get(url).data['price'], '45.00')
+
+    def test_counts_are_invalidated_only_when_they_can_change(self):
+        before = get_versions(['categories', 'brands'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.price = 45
+            self.shirt.save()
+        self.assertEqual(get_versions(['categories', 'brands']), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.category = self.hats
+            self.shirt.save()
+        after = get_versions(['categories', 'brands'])
+        self.assertNotEqual(after['categories'], before['categories'])
+        self.assertNotEqual(after['brands'], before['brands'])
+
+    def test_category_change_only_invalidates_its_dependents(self):
+        self.client.get(reverse('product-detail', args=['oxford-shirt']))
+        self.client.get(reverse('product-detail', args=['wool-hat']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hats.name = 'Caps'
+            self.hats.save()
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('product-detail', args=['oxford-shirt']))
+        response = self.client.get(reverse('product-detail', args=['wool-hat']))
+        self.assertEqual(response.data['category_details']['name'], 'Caps')
+
+    def test_matching_etag_gets_not_modified(self):
+        url = reverse('product-detail', args=['oxford-shirt'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.price = 45
+            self.shirt.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        self.products = [
+            Product.objects.create(
+                name=f'Shirt {number}', slug=f'shirt-{number}', description='Shirt',
+                category=self.shirts, price=40, status='published'
+            )
+            for number in range(3)
+        ]
+        self.draft = Product.objects.create(name='Draft', slug='draft', description='Draft', price=10)
+        ProductImage.objects.create(product=self.products[1], image='products/shirt.jpg', is_primary=True)
+
+    def batch(self, **params):
+        return self.client.get(reverse('product-batch'), params)
+
+    def test_products_are_returned_in_request_order_with_missing_ids(self):
+        ids = [self.products[2].pk, self.draft.pk, self.products[0].pk, 999999, self.products[1].pk]
+        # Products, images and categories; there are no brands to load
+        with self.assertNumQueries(3):
+            response = self.batch(ids=','.join(map(str, ids)))
+        self.assertEqual(
+            [product['slug'] for product in response.data['results']],
+            ['shirt-2', 'shirt-0', 'shirt-1']
+        )
+        self.assertEqual(response.data['missing'], [self.draft.pk, 999999])
+        self.assertEqual(len(response.data['results'][2]['images']), 1)
+
+        detail = self.client.get(reverse('product-detail', args=['shirt-1']))
+        self.assertEqual(response.data['results'][2], detail.data)
+
+    def test_products_share_the_detail_cache(self):
+        self.client.get(reverse('product-detail', args=['shirt-0']))
+        with self.assertNumQueries(3):
+            self.batch(slugs='shirt-0,shirt-1')
+        with self.assertNumQueries(0):
+            response = self.batch(slugs='shirt-1,shirt-0')
+            self.client.get(reverse('product-detail', args=['shirt-1']))
+        self.assertEqual([product['slug'] for product in response.data['results']], ['shirt-1', 'shirt-0'])
+        with self.assertNumQueries(0):
+            self.batch(ids=f'{self.products[1].pk}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].price = 45
+            self.products[0].save()
+        response = self.batch(slugs='shirt-0,shirt-1')
+        self.assertEqual(response.data['results'][0]['price'], '45.00')
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch(ids='1', slugs='shirt-0').status_code, 400)
+        self.assertEqual(self.batch(ids='1,x').status_code, 400)
+        self.assertEqual(self.batch(ids='1,²').status_code, 400)
+        self.assertEqual(self.batch(ids=str(2 ** 63)).status_code, 400)
+        self.assertEqual(self.batch(ids=','.join(map(str, range(1, 102)))).status_code, 400)
+
+
+class SlugAllocationTests(TestCase):
+    def product(self, name, **kwargs):
+        return Product(name=name, description='Item', price=10, **kwargs)
+
+    def test_batch_numbers_after_existing_slugs_in_one_query(self):
+        for slug in ['blue-t-shirt', 'blue-t-shirt-4', 'blue-t-shirt-pack']:
+            self.product('Blue T-Shirt', slug=slug).save()
+
+        batch = [self.product('Blue T-Shirt'), self.product('Red Hat'), self.product('Blue t shirt')]
+        with self.assertNumQueries(1):
+            Product.objects.allocate_slugs(batch)
+        self.assertEqual(
+            [product.slug for product in batch],
+            ['blue-t-shirt-5', 'red-hat', 'blue-t-shirt-6']
+        )
+
+    def test_numbered_slugs_of_other_products_leave_the_bare_base_free(self):
+        self.product('iPhone 15').save()
+
+        batch = [self.product('iPhone'), self.product('iPhone')]
+        Product.objects.allocate_slugs(batch)
+        self.assertEqual([product.slug for product in batch], ['iphone', 'iphone-16'])
+
+    def test_batch_never_repeats_a_slug_across_similar_names(self):
+        self.product('Blue T-Shirt').save()
+        for names in (['Blue T-Shirt 1', 'Blue T-Shirt'], ['Blue T-Shirt', 'Blue T-Shirt 1']):
+            batch = [self.product(name) for name in names]
+            Product.objects.allocate_slugs(batch)
+            slugs = [product.slug for product in batch]
+            self.assertEqual(len(set(slugs)), 2, slugs)
+            self.assertNotIn('blue-t-shirt', slugs)
+
+    def test_import_of_similar_names_gets_distinct_slugs(self):
+        rows = [
+            {'sku': f'TEE-{number}', 'name': name, 'description': 'Tee', 'price': '10'}
+            for number, name in enumerate(['Blue T-Shirt', 'Blue T-Shirt', 'Blue T-Shirt 1'])
+        ]
+        importer = ProductImporter().run(enumerate(rows, start=1))
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)),
+            ['blue-t-shirt', 'blue-t-shirt-1', 'blue-t-shirt-1-1']
+        )
+
+    def test_route_words_are_never_used_as_slugs(self):
+        imported = self.product('Import')
+        imported.save()
+        self.assertEqual(imported.slug, 'import-1')
+        with self.assertRaises(ValidationError):
+            self.product('Stock', slug='stock').full_clean()
+
+        importer = ProductImporter().run([
+            (1, {'sku': 'BATCH-1', 'name': 'Batch', 'description': 'Batch', 'price': '5', 'slug': 'batch'}),
+        ])
+        self.assertEqual(list(importer.errors[0]['errors']), ['slug'])
+
+        cache.clear()
+        featured = self.product('Lamp', status='published', is_featured=True)
+        featured.save()
+        response = self.client.get(reverse('featured-products'))
+        self.assertEqual([product['slug'] for product in response.data['results']], ['lamp'])
+
+    def test_save_retries_when_slug_is_claimed_concurrently(self):
+        Product.objects.create(name='Hat', slug='hat', description='Hat', price=5)
+        allocate = Product.objects.allocate_slugs
+
+        def stale_allocation(products):
+            # First attempt behaves as if 'hat' were still free
+            if allocate_mock.call_count == 1:
+                products[0].slug = 'hat'
+                return products
+            return allocate(products)
+
+        with mock.patch.object(Product.objects, 'allocate_slugs', side_effect=stale_allocation) as allocate_mock:
+            product = self.product('Hat')
+            product.save()
+        self.assertEqual(product.slug, 'hat-1')
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        Category.objects.create(name='Kitchen', slug='kitchen')
+        Product.objects.create(
+            name='Mug', slug='mug', sku='MUG-1', description='Mug', price=8, quantity=3
+        )
+
+    def test_command_upserts_by_sku_and_reports_bad_rows(self):
+        rows = (
+            'sku,name,description,price,quantity,category,brand,status\n'
+            'MUG-1,,,9.50,,,,\n'
+            'MUG-2,Mug,Stoneware mug,12,10,kitchen,,published\n'
+            'MUG-3,Mug,Travel mug,15,4,,acme,\n'
+            'MUG-4,Bowl,,6,1,,,\n'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'feed.csv')
+            report = os.path.join(directory, 'errors.jsonl')
+            with open(path, 'w') as feed:
+                feed.write(rows)
+            out = StringIO()
+            call_command('import_products', path, report=report, stdout=out)
+            with open(report) as errors:
+                errors = [json.loads(line) for line in errors]
+
+        self.assertIn('1 created, 1 updated, 2 rejected', out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual([(error['row'], list(error['errors'])) for error in errors], [(3, ['brand']), (4, ['description'])])
+
+        updated = Product.objects.get(sku='MUG-1')
+        self.assertEqual((updated.price, updated.quantity, updated.name), (Decimal('9.50'), 3, 'Mug'))
+        created = Product.objects.get(sku='MUG-2')
+        self.assertEqual((created.slug, created.category.slug), ('mug-1', 'kitchen'))
+        self.assertEqual(Product.objects.search('stoneware').get(), created)
+
+    def test_conflicting_explicit_slugs_are_rejected_per_row(self):
+        rows = [
+            {'sku': 'MUG-5', 'name': 'Mug', 'description': 'Mug', 'price': '5', 'slug': 'mug'},
+            {'sku': 'CUP-1', 'name': 'Cup', 'description': 'Cup', 'price': '5', 'slug': 'cup'},
+            {'sku': 'CUP-2', 'name': 'Cup', 'description': 'Cup', 'price': '5', 'slug': 'cup'},
+            {'sku': 'CUP-3', 'name': 'Cup', 'description': 'Cup', 'price': '5'},
+        ]
+        importer = ProductImporter().run(enumerate(rows, start=1))
+
+        self.assertEqual([(error['sku'], list(error['errors'])) for error in importer.errors], [
+            ('MUG-5', ['slug']), ('CUP-2', ['slug'])
+        ])
+        self.assertEqual(
+            dict(Product.objects.filter(sku__startswith='CUP').values_list('sku', 'slug')),
+            {'CUP-1': 'cup', 'CUP-3': 'cup-1'}
+        )
+
+    def test_publishing_update_sets_published_at_and_updated_at(self):
+        mug = Product.objects.get(sku='MUG-1')
+        Product.objects.filter(pk=mug.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        ProductImporter().run([(1, {'sku': 'MUG-1', 'status': 'published'})])
+
+        published = Product.objects.get(sku='MUG-1')
+        self.assertIsNotNone(published.published_at)
+        self.assertGreater(published.updated_at, mug.updated_at)
+
+        ProductImporter().run([(1, {'sku': 'MUG-1', 'status': 'published', 'quantity': 2})])
+        self.assertEqual(Product.objects.get(sku='MUG-1').published_at, published.published_at)
+
+    def test_rejected_chunk_is_reported_row_by_row(self):
+        def take_existing_slug(products, reserved=()):
+            for product in products:
+                product.slug = 'mug'
+        rows = [
+            (1, {'sku': 'MUG-1', 'quantity': 5}),
+            (2, {'sku': 'CUP-1', 'name': 'Cup', 'description': 'Cup', 'price': '5'}),
+            (3, {'sku': 'MUG-1', 'price': '6'}),
+            (4, {'sku': 'MUG-1', 'price': '7'}),
+            (5, {'sku': 'MUG-1'}),
+        ]
+        with mock.patch.object(Product.objects, 'allocate_slugs', side_effect=take_existing_slug):
+            importer = ProductImporter(chunk_size=2).run(rows)
+
+        self.assertEqual([(error['row'], error['sku']) for error in importer.errors], [(1, 'MUG-1'), (2, 'CUP-1')])
+        self.assertEqual((importer.rows, importer.created, importer.updated, importer.superseded), (5, 0, 2, 1))
+        self.assertEqual(Product.objects.get(sku='MUG-1').price, Decimal('7'))
+        self.assertFalse(Product.objects.filter(sku='CUP-1').exists())
+
+    def test_upload_that_is_not_utf8_writes_nothing(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw', first_name='A', last_name='A')
+        self.client.force_login(admin)
+        feed = b'{"sku": "MUG-1", "quantity": 40}\n' * 3 + b'{"sku": "MUG-1", "name": "\xff"}\n'
+        with mock.patch('apps.products.views.ProductImporter', wraps=ProductImporter) as importer:
+            response = self.client.post(reverse('product-import'), {'file': SimpleUploadedFile('feed.jsonl', feed)})
+
+        self.assertEqual(response.status_code, 400)
+        importer.assert_not_called()
+        self.assertEqual(Product.objects.get(sku='MUG-1').quantity, 3)
+
+    def test_upload_endpoint_is_admin_only(self):
+        feed = b'{"sku": "MUG-1", "quantity": 40}\nnot json\n'
+        url = reverse('product-import')
+        response = self.client.post(url, {'file': SimpleUploadedFile('feed.jsonl', feed)})
+        self.assertEqual(response.status_code, 401)
+
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw', first_name='A', last_name='A')
+        self.client.force_login(admin)
+        response = self.client.post(url, {'file': SimpleUploadedFile('feed.jsonl', feed)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['rejected']), (1, 1))
+        self.assertEqual(Product.objects.get(sku='MUG-1').quantity, 40)
+
+
+class StockUpdateTests(TestCase):
+    def setUp(self):
+        for sku, quantity in [('A', 50), ('B', 50), ('C', 2)]:
+            Product.objects.create(
+                name=f'Item {sku}', sku=sku, description='Item', price=10, compare_price=12,
+                quantity=quantity, status='published'
+            )
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw', first_name='A', last_name='A')
+        self.client.force_login(admin)
+
+    def test_batch_is_applied_with_per_sku_results(self):
+        cache.clear()
+        self.client.get(reverse('product-detail', args=['item-a']))
+        updates = [
+            {'sku': 'A', 'price': '9.99', 'compare_price': None},
+            {'sku': 'B', 'quantity': 3},
+            {'sku': 'C', 'quantity': 1},
+            {'sku': 'Z', 'quantity': 1},
+            {'sku': 'A', 'quantity': -1},
+        ]
+        with mock.patch.object(send_stock_alert_digest, 'apply_async') as digest, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('product-stock-update'), updates, content_type='application/json')
+
+        self.assertEqual(
+            [(result['sku'], result['status']) for result in response.data['results']],
+            [('A', 'updated'), ('B', 'updated'), ('C', 'updated'), ('Z', 'not_found'), ('A', 'invalid')]
+        )
+        self.assertEqual(response.data['results'][0]['compare_price'], None)
+        a, b, c = Product.objects.order_by('sku')
+        self.assertEqual((a.price, a.compare_price, a.quantity), (Decimal('9.99'), None, 50))
+        self.assertEqual((b.price, b.quantity), (Decimal('10.00'), 3))
+
+        # C was already low, so only B alerts; C going from low to 1 left is no change of level
+        self.assertEqual(list(StockAlert.objects.values_list('product__sku', 'level')), [('B', 'low_stock')])
+        digest.assert_called_once()
+
+        response = self.client.get(reverse('product-detail', args=['item-a']))
+        self.assertEqual(response.data['price'], '9.99')
+
+
+class ProductExportTests(TestCase):
+    def setUp(self):
+        kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        Category.objects.create(name='Garden', slug='garden')
+        mug = Product.objects.create(
+            name='Mug', sku='MUG-1', description='Mug', price=8, category=kitchen, status='published'
+        )
+        ProductImage.objects.create(product=mug, image='products/mug.jpg', is_primary=True)
+        Product.objects.create(name='Spade', sku='SPADE-1', description='Spade', price=20, quantity=9)
+
+    def test_command_output_can_be_imported_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+            call_command('export_products', output=path)
+            with open(path) as export:
+                rows = list(csv.DictReader(export))
+            self.assertEqual([row['sku'] for row in rows], ['MUG-1', 'SPADE-1'])
+            self.assertEqual(rows[0]['category'], 'kitchen')
+            self.assertTrue(rows[0]['primary_image'].endswith('products/mug.jpg'))
+
+            out = StringIO()
+            call_command('import_products', path, stdout=out)
+        self.assertIn('0 created, 2 updated, 0 rejected', out.getvalue())
+
+    def test_endpoint_streams_filtered_rows(self):
+        url = reverse('product-export', args=['jsonl'])
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        admin = User.objects.create_superuser(email='admin@example.com', password='pw', first_name='A', last_name='A')
+        self.client.force_login(admin)
+        response = self.client.get(url, {'category': 'kitchen'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['sku'], row['price']) for row in rows], [('MUG-1', '8.00')])
+
+
+class ProductRowsListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        shoes = Category.objects.create(name='Shoes', slug='shoes')
+        acme = Brand.objects.create(name='Acme', slug='acme')
+        runner = Product.objects.create(
+            name='Runner', description='Shoe', category=shoes, brand=acme, price=80, compare_price=100,
+            quantity=0, status='published', is_featured=True, rating_count=2, rating_sum=9
+        )
+        ProductImage.objects.create(product=runner, image='products/runner.jpg', alt_text='Runner', is_primary=True)
+        Product.objects.create(name='Laces', description='Laces', price=3, quantity=50, status='published')
+
+    def assertMatchesSerializer(self, url):
+        response = self.client.get(url)
+        products = Product.objects.filter(pk__in=[product['id'] for product in response.json()['results']])
+        expected = ProductListSerializer(products.order_by('-created_at', '-id'), many=True).data
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(expected)))
+
+    def test_rows_match_serializer_output(self):
+        self.assertMatchesSerializer(reverse('product-list'))
+
+
+
+class ImageDerivativeTests(TestCase):
+    label = 'products.ProductImage.image'
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.product = Product.objects.create(
+            name='Runner', description='Shoe', price=80, quantity=5, status='published'
+        )
+        upload = BytesIO()
+        Image.new('RGBA', (1200, 800), (200, 30, 30, 128)).save(upload, 'PNG')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.image = ProductImage.objects.create(
+                product=self.product,
+                image=SimpleUploadedFile('runner.png', upload.getvalue()),
+                is_primary=True,
+            )
+        self.queued = callbacks
+
+    def test_upload_queues_derivatives(self):
+        with mock.patch.object(images, 'enqueue') as enqueue:
+            for callback in self.queued:
+                callback()
+        enqueue.assert_called_once_with(self.label, [self.image.pk])
+        self.assertEqual(list(images.pending(self.label)), [self.image.pk])
+
+    def test_derivatives_are_exposed_as_srcset(self):
+        generate_image_derivatives(self.label, [self.image.pk])
+
+        self.image.refresh_from_db()
+        files = self.image.image_derivatives['files']
+        # Widths above the 1200px original are skipped
+        self.assertEqual(set(files['webp']), {'150x150', '300x300', '320w', '640w', '1024w'})
+        with self.image.image.storage.open(files['jpeg']['640w']) as file:
+            self.assertEqual(Image.open(file).size, (640, 427))
+        self.assertEqual(list(images.pending(self.label)), [])
+
+        response = self.client.get(reverse('product-detail', kwargs={'slug': self.product.slug}))
+        srcset = response.data['images'][0]['srcset']
+        self.assertTrue(srcset['webp']['320w'].endswith('products/derivatives/runner/320w.webp'))
+        response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.json()['results'][0]['primary_image']['srcset'], srcset)
+
+    def test_replaced_file_falls_back_to_original(self):
+        generate_image_derivatives(self.label, [self.image.pk])
+        self.image.refresh_from_db()
+        self.image.image = 'products/other.png'
+        self.image.save()
+
+        self.assertIsNone(ProductImageSerializer(self.image).data['srcset'])
+        self.assertEqual(list(images.pending(self.label)), [self.image.pk])
+
+    def test_backfill_queues_pending_images(self):
+        with mock.patch.object(generate_image_derivatives, 'delay') as delay:
+            call_command('generate_image_derivatives', self.label, stdout=StringIO())
+        delay.assert_called_once_with(self.label, [self.image.pk])
+
+
+class StockAlertTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name='Kettle', sku='KETTLE', description='Kettle', price=30, quantity=10,
+            low_stock_threshold=3, status='published'
+        )
+        User.objects.create_superuser(email='admin@example.com', password='pw', first_name='A', last_name='A')
+
+    def set_quantity(self, quantity):
+        self.product.quantity = quantity
+        with mock.patch.object(send_stock_alert_digest, 'apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+    def test_transitions_alert_once_per_level_and_window(self):
+        self.set_quantity(8)
+        self.set_quantity(3)
+        self.set_quantity(2)
+        self.set_quantity(5)
+        self.set_quantity(2)
+        self.set_quantity(0)
+
+        self.assertEqual(
+            list(StockAlert.objects.order_by('pk').values_list('level', 'quantity')),
+            [('low_stock', 3), ('out_of_stock', 0)]
+        )
+
+    def test_digest_mails_pending_alerts_once(self):
+        self.set_quantity(2)
+        other = Product.objects.create(name='Toaster', sku='TOASTER', description='Toaster', price=20, quantity=1)
+        StockAlert.objects.create(product=other, level='out_of_stock', quantity=0)
+
+        send_stock_alert_digest()
+        send_stock_alert_digest()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['admin@example.com'])
+        self.assertIn('Out of stock: Toaster (SKU TOASTER), 0 left', mail.outbox[0].body)
+        self.assertIn('Low stock: Kettle (SKU KETTLE), 2 left', mail.outbox[0].body)
+        self.assertFalse(StockAlert.objects.filter(notified_at__isnull=True).exists())
+
+    def test_low_stock_admin_lists_low_stock_products(self):
+        self.set_quantity(1)
+        Product.objects.create(name='Toaster', description='Toaster', price=20, quantity=50, status='published')
+        self.client.force_login(User.objects.get(email='admin@example.com'))
+
+        response = self.client.get(reverse('admin:products_lowstockproduct_changelist'))
+        self.assertEqual([product.name for product in response.context['cl'].result_list], ['Kettle'])
+
+    def test_low_stock_changelist_edits_run_product_receivers(self):
+        self.set_quantity(2)
+        self.client.force_login(User.objects.get(email='admin@example.com'))
+        scope = f'product:{self.product.pk}'
+        before = get_versions([scope])
+
+        with mock.patch.object(send_stock_alert_digest, 'apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:products_lowstockproduct_changelist'), {
+                'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '1',
+                'form-0-id': str(self.product.pk), 'form-0-quantity': '0', '_save': 'Save',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(get_versions([scope]), before)
+        self.assertTrue(StockAlert.objects.filter(product=self.product, level='out_of_stock').exists())
+
+
+class CatalogQueryPlanTests(TestCase):
+    """Catalog reads must be served by the partial indexes, not sequential scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create(
+            Category(name=f'Category {number}', slug=f'category-{number}', path=f'{number + 1}/')
+            for number in range(20)
+        )
+        brands = Brand.objects.bulk_create(
+            Brand(name=f'Brand {number}', slug=f'brand-{number}') for number in range(20)
+        )
+        statuses = ['published'] * 7 + ['draft'] * 2 + ['archived']
+        Product.objects.bulk_create(
+            Product(
+                name=f'Product {number}',
+                slug=f'product-{number}',
+                sku=f'SKU-{number}',
+                description='Seeded product',
+                price=number % 500 + 1,
+                quantity=number % 40,
+                status=statuses[number % len(statuses)],
+                category=categories[number % len(categories)],
+                brand=brands[number * 7 % len(brands)],
+                is_featured=number % 50 == 0,
+                is_bestseller=number % 30 == 1,
+                is_new=number % 10 == 2,
+            )
+            for number in range(10000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE products_product, products_category, products_brand')
+
+    def assertNoSequentialScan(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', []))
+            if node['Node Type'] == 'Seq Scan' and node['Relation Name'] == 'products_product':
+                self.fail(f'Sequential scan on products_product:\n{sql}')
+
+    def test_manager_queries_use_indexes(self):
+        querysets = {
+            'active': Product.objects.active(),
+            'available': Product.objects.available(),
+            'by_category': Product.objects.by_category('category-3'),
+            'featured': Product.objects.featured(),
+            'bestsellers': Product.objects.bestsellers(),
+            'new_arrivals': Product.objects.new_arrivals(),
+            'low_stock': Product.objects.low_stock().order_by('quantity', 'id'),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(name):
+                self.assertNoSequentialScan(*queryset[:20].query.sql_with_params())
+
+    def test_list_view_queries_use_indexes(self):
+        params = [
+            {},
+            {'sort': 'price'},
+            {'sort': '-price'},
+            {'sort': 'popularity'},
+            {'category': 'category-3'},
+            {'brand': 'brand-4'},
+            {'featured': 'true'},
+            {'bestseller': 'true'},
+            {'new': 'true'},
+            {'min_price': 10, 'max_price': 40},
+            {'category': 'category-3', 'sort': 'price'},
+            {'brand': 'brand-4', 'featured': 'true'},
+        ]
+        for query in params:
+            with self.subTest(**query):
+                cache.clear()
+                # Keyset pages; page numbers add a COUNT(*) over the matching rows
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse('product-list'), {**query, 'cursor': ''})
+                self.assertEqual(response.status_code, 200)
+                for executed in queries:
+                    if 'FROM "products_product"' in executed['sql']:
+                        self.assertNoSequentialScan(executed['sql'])
+
+
+class RelatedProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='buyer@example.com', password='pw', first_name='B', last_name='B')
+        self.products = {
+            name: Product.objects.create(
+                name=name, description=name, price=10, quantity=100,
+                status='draft' if name == 'Descaler' else 'published'
+            )
+            for name in ['Kettle', 'Mug', 'Tea', 'Toaster', 'Descaler']
+        }
+        for names, status in [
+            (['Kettle', 'Mug'], 'delivered'),
+            (['Kettle', 'Mug', 'Tea'], 'delivered'),
+            (['Kettle', 'Tea', 'Tea'], 'shipped'),
+            (['Kettle', 'Mug'], 'pending'),
+            (['Kettle', 'Descaler'], 'delivered'),
+            (['Kettle', 'Descaler'], 'delivered'),
+            (['Toaster'], 'delivered'),
+            (['Kettle', 'Toaster'], 'cancelled'),
+            (['Kettle', 'Toaster'], 'cancelled'),
+        ]:
+            self.order(names, status)
+
+    def order(self, names, status='delivered', age=timedelta(hours=1)):
+        address = {
+            f'{kind}_{field}': 'x'
+            for kind in ('shipping', 'billing')
+            for field in ('first_name', 'last_name', 'address_line1', 'city', 'state', 'country', 'zip_code')
+        }
+        order = Order.objects.create(user=self.user, status=status, customer_email=self.user.email, **address)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - age)
+        for name in names:
+            OrderItem.objects.create(
+                order=order, product=self.products[name], quantity=1, unit_price=10, total_price=10
+            )
+
+    def related(self, name):
+        response = self.client.get(reverse('product-related', args=[self.products[name].slug]))
+        return [product['name'] for product in response.data]
+
+    def test_related_products_are_ranked_from_co_purchases(self):
+        run = related.update_related_products(full=True, batch_size=4)
+        self.assertEqual(run.orders, 9)
+
+        kettle = RelatedProduct.objects.filter(product=self.products['Kettle'])
+        self.assertEqual(
+            [(row.related.name, row.co_purchases, round(row.score, 3)) for row in kettle],
+            [('Mug', 3, 0.707), ('Tea', 2, 0.577), ('Descaler', 2, 0.577)]
+        )
+        # Drafts are hidden and cancelled orders don't count
+        with self.assertNumQueries(1):
+            self.assertEqual(self.related('Kettle'), ['Mug', 'Tea'])
+        self.assertEqual(self.related('Toaster'), [])
+
+    def test_incremental_update_adds_new_orders(self):
+        related.update_related_products(full=True)
+        self.assertEqual(self.related('Tea'), ['Kettle'])
+        self.order(['Tea', 'Toaster'], age=timedelta(0))
+        self.order(['Tea', 'Toaster', 'Mug'], age=timedelta(0))
+
+        later = timezone.now() + related.ORDER_SETTLE_TIME
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(related.timezone, 'now', return_value=later):
+            run = related.update_related_products()
+        self.assertEqual(run.orders, 2)
+        self.assertEqual(self.related('Tea'), ['Toaster', 'Mug', 'Kettle'])
+        self.assertEqual(
+            ProductPairCount.objects.get(product=self.products['Tea'], related=self.products['Tea']).count, 4
+        )
+        self.assertIsNone(related.update_related_products())
+
+    def test_orders_are_counted_once_they_have_settled(self):
+        related.update_related_products(full=True)
+        # Created just now, so its transaction may not have committed everywhere yet
+        self.order(['Tea', 'Toaster'], age=timedelta(0))
+        self.assertIsNone(related.update_related_products())
+
+        later = timezone.now() + related.ORDER_SETTLE_TIME
+        with mock.patch.object(related.timezone, 'now', return_value=later):
+            run = related.update_related_products()
+        self.assertEqual(run.orders, 1)
+        self.assertEqual(
+            ProductPairCount.objects.get(product=self.products['Tea'], related=self.products['Toaster']).count, 1
+        )
+
+
+class ProductFlagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='buyer@example.com', password='pw', first_name='B', last_name='B')
+        kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        garden = Category.objects.create(name='Garden', slug='garden')
+        self.products = {}
+        for name, category in [('Kettle', kitchen), ('Mug', kitchen), ('Pan', kitchen), ('Hose', garden), ('Rake', garden)]:
+            self.products[name] = Product.objects.create(
+                name=name, description=name, price=10, quantity=100, status='published',
+                category=category, is_bestseller=name == 'Pan'
+            )
+
+    def sell(self, name, quantity, days_ago=0, status='delivered'):
+        address = {
+            f'{kind}_{field}': 'x'
+            for kind in ('shipping', 'billing')
+            for field in ('first_name', 'last_name', 'address_line1', 'city', 'state', 'country', 'zip_code')
+        }
+        order = Order.objects.create(user=self.user, status=status, customer_email=self.user.email, **address)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        OrderItem.objects.create(
+            order=order, product=self.products[name], quantity=quantity, unit_price=10, total_price=10 * quantity
+        )
+
+    def test_bestsellers_are_top_decayed_sellers_per_category(self):
+        self.sell('Kettle', 10, days_ago=60)  # worth 10 / 2^(60/14) ~ 0.5
+        self.sell('Mug', 2, days_ago=1)
+        self.sell('Pan', 1, days_ago=200)  # outside the window
+        self.sell('Kettle', 50, status='cancelled')
+        self.sell('Rake', 1)
+
+        changed, _ = flags.update_product_flags(bestsellers_per_category=1)
+
+        self.assertEqual(
+            set(Product.objects.bestsellers().values_list('name', flat=True)), {'Mug', 'Rake'}
+        )
+        # Mug and Rake set, Pan cleared
+        self.assertEqual(changed, 3)
+        self.assertEqual(flags.update_product_flags(bestsellers_per_category=1), (0, 0))
+
+    def test_new_arrival_flag_expires(self):
+        Product.objects.filter(name='Kettle').update(published_at=timezone.now() - timedelta(days=31))
+        Product.objects.filter(name='Mug').update(published_at=timezone.now() - timedelta(days=29))
+
+        _, expired = flags.update_product_flags(new_arrival_days=30)
+
+        self.assertEqual(expired, 1)
+        self.assertEqual(
+            set(Product.objects.new_arrivals().values_list('name', flat=True)), {'Mug', 'Pan', 'Hose', 'Rake'}
+        )
+
+
+class ProductViewCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        popularity.local_buffer.drain()
+        self.products = {
+            name: Product.objects.create(name=name, description=name, price=10, quantity=5, status='published')
+            for name in ['Kettle', 'Mug', 'Tea']
+        }
+
+    def view(self, name, times=1):
+        for _ in range(times):
+            response = self.client.get(reverse('product-detail', args=[self.products[name].slug]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_views_are_buffered_and_flushed_as_daily_counts(self):
+        self.view('Mug', 3)
+        self.view('Tea')
+        # Counted without writes, including the cached responses
+        self.assertFalse(ProductViewCount.objects.exists())
+
+        self.assertEqual(popularity.flush_views(), 4)
+        self.view('Mug')
+        self.assertEqual(popularity.flush_views(), 1)
+        self.assertEqual(popularity.flush_views(), 0)
+
+        self.assertEqual(
+            dict(ProductViewCount.objects.values_list('product__name', 'views')), {'Mug': 4, 'Tea': 1}
+        )
+        response = self.client.get(reverse('product-list'), {'sort': 'popularity'})
+        self.assertEqual([product['name'] for product in response.data['results']], ['Mug', 'Tea', 'Kettle'])
+
+    def test_popularity_only_counts_recent_days(self):
+        today = timezone.now().date()
+        ProductViewCount.objects.bulk_create([
+            ProductViewCount(product=self.products['Kettle'], date=today - timedelta(days=30), views=100),
+            ProductViewCount(product=self.products['Kettle'], date=today, views=2),
+            ProductViewCount(product=self.products['Tea'], date=today - timedelta(days=1), views=5),
+        ])
+        Product.objects.filter(name='Mug').update(popularity=50)
+
+        popularity.recompute_popularity()
 
-# Create your tests here.
+        self.assertEqual(
+            dict(Product.objects.values_list('name', 'popularity')), {'Kettle': 2, 'Mug': 0, 'Tea': 5}
+        )
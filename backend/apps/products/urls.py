@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # Categories
     path('categories/', views.CategoryListView.as_view(), name='category-list'),
+    path('categories/tree/', views.CategoryTreeView.as_view(), name='category-tree'),
     path('categories/<slug:slug>/', views.CategoryDetailView.as_view(), name='category-detail'),
     
     # Brands
@@ -12,11 +13,15 @@ urlpatterns = [
     
     # Products
     path('products/', views.ProductListView.as_view(), name='product-list'),
+    path('products/export/<str:file_format>/', views.ProductExportView.as_view(), name='product-export'),
+    path('products/stock/', views.ProductStockUpdateView.as_view(), name='product-stock-update'),
+    path('products/import/', views.ProductImportView.as_view(), name='product-import'),
+    path('products/batch/', views.ProductBatchView.as_view(), name='product-batch'),
+    path('products/autocomplete/', views.ProductAutocompleteView.as_view(), name='product-autocomplete'),
+    path('products/featured/', views.FeaturedProductsView.as_view(), name='featured-products'),
     path('products/<slug:slug>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('products/<slug:slug>/related/', views.RelatedProductsView.as_view(), name='product-related'),
     path('products/<slug:slug>/stats/', views.product_stats, name='product-stats'),
     
-    # Special product lists
-    path('products/featured/', views.FeaturedProductsView.as_view(), name='featured-products'),
-    
     # Reviews
 ]
\ No newline at end of file
@@ -1,61 +1,164 @@
+import hashlib
+import os
+import re
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 
-from .models import Category, Brand, Product
+from apps.core.pagination import KeysetPagination
+from . import alerts, popularity
+from .cache import (
+    CHANGES, CachedResponseMixin, conditional_response, entry_key, get_cached_entries, get_cached_entry,
+    get_versions, get_versions_since, product_scopes, response_key, set_cached_entries, set_cached_entry
+)
+
+from .exporter import EXPORT_FORMATS, export_rows
+from .importer import FORMATS, ProductImporter, is_utf8, read_rows
+from .models import Category, Brand, Product, primary_image_prefetch
+from .readers import ProductRowsListMixin
 from .serializers import (
     CategorySerializer, BrandSerializer, ProductListSerializer,
-    ProductDetailSerializer
+    ProductDetailSerializer, StockUpdateSerializer
 )
-from .filters import ProductFilter
+from .filters import ProductFilter, facet_counts
 
 
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.filter(is_active=True)
+def _results(data):
+    """Rows of a paginated or unpaginated list response"""
+    return data['results'] if isinstance(data, dict) else data
+
+
+class CategoryListView(CachedResponseMixin, generics.ListAPIView):
+    cache_scopes = ['categories']
+    queryset = Category.objects.with_products_count().filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
-    queryset = Category.objects.filter(is_active=True)
+class CategoryTreeView(APIView):
+    """Full nested tree of active categories for navigation menus"""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        key = response_key('CategoryTreeView', request)
+        entry = get_cached_entry(key)
+        if entry is None:
+            versions = get_versions(['categories'])
+            entry = set_cached_entry(key, self.build_tree(), versions)
+        return conditional_response(request, key, entry)
+
+    @staticmethod
+    def build_tree():
+        categories = Category.objects.filter(is_active=True).order_by('name').values(
+            'id', 'name', 'slug', 'parent_id'
+        )
+        nodes = {
+            category['id']: {
+                'id': category['id'],
+                'name': category['name'],
+                'slug': category['slug'],
+                'children': [],
+            }
+            for category in categories
+        }
+
+        roots = []
+        for category in categories:
+            node = nodes[category['id']]
+            if category['parent_id'] is None:
+                roots.append(node)
+            elif category['parent_id'] in nodes:
+                nodes[category['parent_id']]['children'].append(node)
+        return roots
+
+
+class CategoryDetailView(CachedResponseMixin, generics.RetrieveAPIView):
+    cache_scopes = ['categories']
+    queryset = Category.objects.with_products_count().filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
 
-class BrandListView(generics.ListAPIView):
-    queryset = Brand.objects.filter(is_active=True)
+class BrandListView(CachedResponseMixin, generics.ListAPIView):
+    cache_scopes = ['brands']
+    queryset = Brand.objects.with_products_count().filter(is_active=True).order_by('name')
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class BrandDetailView(generics.RetrieveAPIView):
-    queryset = Brand.objects.filter(is_active=True)
+class BrandDetailView(CachedResponseMixin, generics.RetrieveAPIView):
+    cache_scopes = ['brands']
+    queryset = Brand.objects.with_products_count().filter(is_active=True).order_by('name')
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(CachedResponseMixin, ProductRowsListMixin, generics.ListAPIView):
+    cache_scopes = ['products']
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
 
+    # ?sort= options; each ends in a unique key so it can be used as a keyset
+    SORT_OPTIONS = {
+        'newest': ('-created_at', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'popularity': ('-popularity', '-id'),
+    }
+
+    # Query parameters that do not change which products match
+    NON_FILTER_PARAMS = {'page', 'page_size', 'sort', 'facets'}
+    FACET_CACHE_TIMEOUT = 60 * 5
+
+    def get_cache_scopes(self, data):
+        return product_scopes(_results(data))
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        facets = request.query_params.get('facets')
+        if facets and isinstance(response.data, dict):
+            response.data['facets'] = self.get_facets(sorted(set(facets.split(','))))
+        return response
+
+    def get_facets(self, facets):
+        """Facet counts for the current filter set, cached per filter signature"""
+        signature = '&'.join(
+            f'{key}={value}'
+            for key, values in sorted(self.request.query_params.lists())
+            if key not in self.NON_FILTER_PARAMS
+            for value in sorted(values)
+        )
+        version = get_versions(['products'])['products']
+        digest = hashlib.md5(f'{signature}|{",".join(facets)}|{version}'.encode()).hexdigest()
+        cache_key = f'products:facets:{digest}'
+
+        counts = cache.get(cache_key)
+        if counts is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            counts = facet_counts(queryset, facets)
+            cache.set(cache_key, counts, self.FACET_CACHE_TIMEOUT)
+        return counts
+
     def get_queryset(self):
         queryset = Product.objects.filter(status='published')
         
-        # Filter by category slug
-        category_slug = self.request.query_params.get('category')
-        if category_slug:
-            queryset = queryset.filter(
-                Q(category__slug=category_slug) | 
-                Q(category__parent__slug=category_slug)
-            )
+        # Category (including descendants) is filtered by ProductFilter
         
         # Filter by brand slug
         brand_slug = self.request.query_params.get('brand')
@@ -70,66 +173,404 @@ class ProductListView(generics.ListAPIView):
         if max_price:
             queryset = queryset.filter(price__lte=max_price)
         
-        # Search
+        # Full-text search (prefix matching, ranked)
+        sort = self.request.query_params.get('sort')
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search) |
-                Q(short_description__icontains=search) |
-                Q(category__name__icontains=search) |
-                Q(brand__name__icontains=search)
-            )
+            queryset = Product.objects.search(search, queryset)
+            if sort == 'relevance':
+                queryset = queryset.order_by('-rank', '-created_at')
         
-        return queryset.select_related('category', 'brand').prefetch_related('images')
+        if sort in self.SORT_OPTIONS:
+            queryset = queryset.order_by(*self.SORT_OPTIONS[sort])
+        
+        # Columns, joins and the primary image only for the requested ?fields=
+        return ProductListSerializer.optimize_queryset(queryset, self.request)
 
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(CachedResponseMixin, generics.RetrieveAPIView):
     serializer_class = ProductDetailSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Cached and not-modified responses are views too
+        if response.status_code in (200, 304):
+            popularity.record_view(kwargs['slug'])
+        return response
+
+    def get_object(self):
+        self.object = super().get_object()
+        return self.object
+
+    def get_cache_scopes(self, data):
+        # From the instance, since ?fields= may leave category and brand out
+        return product_scopes([{
+            'id': self.object.pk,
+            'category': self.object.category_id,
+            'brand': self.object.brand_id,
+        }])
+
     def get_queryset(self):
         return Product.objects.filter(status='published').select_related(
             'category', 'brand'
-        ).prefetch_related('images')
+        ).prefetch_related('images', primary_image_prefetch())
+
+
+class ProductBatchView(APIView):
+    """
+    Several products by ?ids= or ?slugs= (comma separated), for hydrating
+    carts, wishlists and recently viewed strips in one request.
+
+    Each product is the ProductDetailView representation and is read from,
+    and written to, the same per-product cache entries, so products already
+    viewed (or batched) cost no queries. The rest are loaded with one query,
+    plus one each for their images, categories and brands. Results follow the requested order; ids or
+    slugs that aren't published products are listed under `missing`.
+    """
+    permission_classes = [permissions.AllowAny]
+    MAX_BATCH_SIZE = 100
+    MAX_ID = 2 ** 63 - 1
+    LOOKUPS = {'ids': 'pk', 'slugs': 'slug'}
+    # Query parameters that change a product's representation
+    REPRESENTATION_PARAMS = ['fields', 'expand']
+
+    def get(self, request):
+        params = [param for param in self.LOOKUPS if param in request.query_params]
+        if len(params) != 1:
+            return Response(
+                {'error': 'Give either ids or slugs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        param = params[0]
+        lookup = self.LOOKUPS[param]
+        values = [value.strip() for value in request.query_params[param].split(',') if value.strip()]
+        if lookup == 'pk':
+            # ASCII digits only (str.isdigit() accepts '²'), within the bigint id range
+            if not all(re.fullmatch(r'[0-9]+', value) and int(value) <= self.MAX_ID for value in values):
+                return Response(
+                    {'error': 'ids must be integers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            values = [str(int(value)) for value in values]
+        # dict.fromkeys() drops repeats but keeps the order
+        values = list(dict.fromkeys(values))
+        if len(values) > self.MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {self.MAX_BATCH_SIZE} products per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        representation = [
+            (key, value)
+            for key in self.REPRESENTATION_PARAMS
+            for value in request.query_params.getlist(key)
+        ]
+
+        def product_key(lookup, value):
+            # Detail entries are keyed by slug; batches by id share the same name
+            return entry_key(ProductDetailView.__name__, request.get_host(), representation, **{lookup: value})
+
+        keys = {value: product_key(lookup, value) for value in values}
+        entries = get_cached_entries(keys.values())
+        found = {value: entries[key]['data'] for value, key in keys.items() if key in entries}
+
+        missed = [value for value in values if value not in found]
+        if missed:
+            before = get_versions([CHANGES])
+            # Category and brand product counts for all products at once
+            products = list(
+                Product.objects.filter(status='published', **{f'{lookup}__in': missed}).prefetch_related(
+                    'images',
+                    Prefetch('category', queryset=Category.objects.with_products_count()),
+                    Prefetch('brand', queryset=Brand.objects.with_products_count()),
+                )
+            )
+            scopes = {
+                product.pk: product_scopes([{
+                    'id': product.pk, 'category': product.category_id, 'brand': product.brand_id,
+                }])
+                for product in products
+            }
+            versions = get_versions_since(before, set().union(*scopes.values()))
+            built = {}
+            for product in products:
+                data = ProductDetailSerializer(product, context={'request': request}).data
+                found[str(getattr(product, lookup))] = data
+                if versions is None:
+                    continue
+                product_versions = {scope: versions[scope] for scope in scopes[product.pk]}
+                for key_lookup, value in (('pk', str(product.pk)), ('slug', product.slug)):
+                    built[product_key(key_lookup, value)] = (data, product_versions)
+            set_cached_entries(built)
+
+        return Response({
+            'results': [found[value] for value in values if value in found],
+            'missing': [int(value) if lookup == 'pk' else value for value in values if value not in found],
+        })
+
+
+class RelatedProductsView(CachedResponseMixin, ProductRowsListMixin, generics.ListAPIView):
+    """Products frequently bought together with this one, best match first"""
+    cache_scopes = ['products', 'related-products']
+    serializer_class = ProductListSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+
+    def get_cache_scopes(self, data):
+        return product_scopes(data)
+
+    def get_queryset(self):
+        # One read of the product's RelatedProduct rows through their unique index
+        queryset = Product.objects.filter(
+            status='published', purchased_with__product__slug=self.kwargs['slug']
+        ).annotate(related_position=F('purchased_with__position')).order_by('related_position')
+        return ProductListSerializer.optimize_queryset(queryset, self.request)
+
+
+class ProductAutocompleteView(APIView):
+    """Typo-tolerant name suggestions for products, categories and brands"""
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'autocomplete'
+
+    MIN_LENGTH = 2
+    MAX_LENGTH = 64
+    DEFAULT_LIMIT = 5
+    MAX_LIMIT = 10
+    CACHE_TIMEOUT = 60 * 5
+
+    def get(self, request):
+        term = ' '.join(request.query_params.get('q', '').lower().split())[:self.MAX_LENGTH]
+        try:
+            limit = min(int(request.query_params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
+
+        if len(term) < self.MIN_LENGTH or limit < 1:
+            return Response({'query': term, 'products': [], 'categories': [], 'brands': []})
+
+        versions = get_versions(['products', 'categories', 'brands'])
+        signature = f"{term}|{versions['products']}|{versions['categories']}|{versions['brands']}"
+        digest = hashlib.md5(signature.encode()).hexdigest()
+        cache_key = f'products:autocomplete:{limit}:{digest}'
+        suggestions = cache.get(cache_key)
+        if suggestions is None:
+            suggestions = {
+                'query': term,
+                'products': self.match(Product.objects.filter(status='published'), term, limit),
+                'categories': self.match(Category.objects.filter(is_active=True), term, limit),
+                'brands': self.match(Brand.objects.filter(is_active=True), term, limit),
+            }
+            cache.set(cache_key, suggestions, self.CACHE_TIMEOUT)
+
+        return Response(suggestions)
 
+    @staticmethod
+    def match(queryset, term, limit):
+        # `<%` (word similarity) is served by the gin_trgm_ops index on name
+        return list(
+            queryset.filter(name__trigram_word_similar=term)
+            .annotate(similarity=TrigramWordSimilarity(term, 'name'))
+            .order_by('-similarity', 'name')
+            .values('id', 'name', 'slug')[:limit]
+        )
 
-class FeaturedProductsView(generics.ListAPIView):
+
+class FeaturedProductsView(CachedResponseMixin, ProductRowsListMixin, generics.ListAPIView):
+    cache_scopes = ['products']
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_cache_scopes(self, data):
+        return product_scopes(_results(data))
+
     def get_queryset(self):
-        return Product.objects.filter(
+        queryset = Product.objects.filter(
             status='published', 
             is_featured=True
-        ).select_related('category', 'brand').prefetch_related('images')[:12]
+        )
+        return ProductListSerializer.optimize_queryset(queryset, self.request)[:12]
+
+
+
+class ProductImportView(APIView):
+    """Admin upload of a CSV or JSON Lines feed; products are upserted by SKU"""
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+    MAX_REPORTED_ERRORS = 100
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        format = request.data.get('format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+        if format not in FORMATS:
+            return Response(
+                {'error': f"Format must be one of: {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Checked up front, so a bad byte can't stop the import after some
+        # chunks are committed
+        if not is_utf8(upload.chunks()):
+            return Response(
+                {'error': 'The file must be UTF-8 encoded'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # The upload is read line by line, never loaded whole
+        upload.seek(0)
+        lines = (line.decode('utf-8-sig') for line in upload)
+        importer = ProductImporter().run(read_rows(lines, format))
+
+        return Response({
+            'rows': importer.rows,
+            'created': importer.created,
+            'updated': importer.updated,
+            'superseded': importer.superseded,
+            'rejected': len(importer.errors),
+            'errors': importer.errors[:self.MAX_REPORTED_ERRORS],
+            'seconds': round(importer.elapsed, 3),
+            'rows_per_second': round(importer.rows_per_second),
+        })
+
+
+class ProductExportView(APIView):
+    """
+    Admin export of the catalog as a streamed CSV or JSON Lines download.
+
+    Accepts the ProductFilter parameters plus `status`; all statuses are
+    exported by default.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, file_format):
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"Format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
+        filterset = ProductFilter(request.query_params, queryset=Product.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filterset.qs
+        product_status = request.query_params.get('status')
+        if product_status:
+            queryset = queryset.filter(status=product_status)
+
+        encode, content_type = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(encode(export_rows(queryset)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
+
+class ProductStockUpdateView(APIView):
+    """
+    Admin batch update of prices and stock levels by SKU, e.g. pushed by an ERP.
+
+    Takes a list of {sku, price, compare_price, quantity} rows, applies the
+    valid ones in one transaction and returns a result for every row.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    MAX_BATCH_SIZE = 5000
+
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'Expected a non-empty list of updates'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > self.MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {self.MAX_BATCH_SIZE} updates per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        row_serializers = [StockUpdateSerializer(data=row) for row in rows]
+        # A later row for the same SKU wins
+        updates = {
+            serializer.validated_data['sku']: serializer.validated_data
+            for serializer in row_serializers if serializer.is_valid()
+        }
+        updated = Product.objects.apply_stock_updates(list(updates.values()))
+
+        alerts.record_transitions(updated.values())
+
+        results = [self.get_result(serializer, updated) for serializer in row_serializers]
+        counts = {'updated': 0, 'not_found': 0, 'invalid': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return Response({**counts, 'results': results})
+
+    @staticmethod
+    def get_result(serializer, updated):
+        if serializer.errors:
+            sku = serializer.initial_data.get('sku') if isinstance(serializer.initial_data, dict) else None
+            return {'sku': sku, 'status': 'invalid', 'errors': serializer.errors}
+
+        sku = serializer.validated_data['sku']
+        product = updated.get(sku)
+        if product is None:
+            return {'sku': sku, 'status': 'not_found'}
+        return {
+            'sku': sku,
+            'status': 'updated',
+            'price': str(product['price']),
+            'compare_price': None if product['compare_price'] is None else str(product['compare_price']),
+            'quantity': product['quantity'],
+        }
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def product_stats(request, slug):
-    try:
-        product = Product.objects.get(slug=slug, status='published')
-        
-        # Get rating distribution
-        rating_distribution = product.reviews.filter(is_approved=True).values(
-            'rating'
-        ).annotate(count=Count('id')).order_by('rating')
-        
-        stats = {
-            'average_rating': product.average_rating,
-            'review_count': product.review_count,
-            'rating_distribution': list(rating_distribution),
-            'in_stock': product.in_stock,
-            'is_low_stock': product.is_low_stock,
-        }
-        
-        return Response(stats)
-        
-    except Product.DoesNotExist:
+    key = response_key('product_stats', request, slug=slug)
+    entry = get_cached_entry(key)
+    if entry is not None:
+        return conditional_response(request, key, entry)
+
+    before = get_versions([CHANGES])
+    # Ratings and stock are stored on the row; verified reviews are a subquery
+    product = Product.objects.with_verified_review_count().filter(
+        slug=slug, status='published'
+    ).first()
+    if product is None:
         return Response(
             {'error': 'Product not found'},
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+
+    versions = get_versions_since(before, [f'product:{product.pk}'])
+    
+    # Rating distribution comes from the stored histogram
+    rating_distribution = [
+        {'rating': rating, 'count': count}
+        for rating, count in product.rating_distribution.items()
+        if count
+    ]
+    
+    stats = {
+        'average_rating': product.average_rating,
+        'review_count': product.review_count,
+        'rating_distribution': rating_distribution,
+        'verified_review_count': product.verified_review_count,
+        'verified_review_share': (
+            round(product.verified_review_count / product.review_count, 2)
+            if product.review_count else 0
+        ),
+        'in_stock': product.in_stock,
+        'is_low_stock': product.is_low_stock,
+    }
+    
+    if versions is None:
+        return Response(stats)
+    entry = set_cached_entry(key, stats, versions)
+    return conditional_response(request, key, entry)
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from apps.products.models import Product
 from .models import ProductReview, ReviewImage, ReviewHelpful, ReviewReport
 
 class ReviewImageInline(admin.TabularInline):
@@ -31,12 +32,16 @@ class ProductReviewAdmin(admin.ModelAdmin):
     actions = ['approve_reviews', 'reject_reviews', 'feature_reviews']
 
     def approve_reviews(self, request, queryset):
+        product_ids = set(queryset.values_list('product_id', flat=True))
         queryset.update(is_approved=True, status='approved')
+        Product.objects.rebuild_rating_aggregates(product_ids)
         self.message_user(request, "Selected reviews were approved successfully")
     approve_reviews.short_description = "Approve selected reviews"
 
     def reject_reviews(self, request, queryset):
+        product_ids = set(queryset.values_list('product_id', flat=True))
         queryset.update(is_approved=False, status='rejected')
+        Product.objects.rebuild_rating_aggregates(product_ids)
         self.message_user(request, "Selected reviews were rejected")
     reject_reviews.short_description = "Reject selected reviews"
 
@@ -0,0 +1,20 @@
+# apps/reviews/managers.py
+from django.apps import apps
+from django.db import models
+from django.db.models import Exists, OuterRef
+
+# Order statuses after which the customer is known to have received the product
+VERIFIED_ORDER_STATUSES = ['shipped', 'delivered']
+
+
+class ProductReviewManager(models.Manager):
+    def verified_purchases(self, queryset=None):
+        """Reviews whose author has a shipped or delivered order for the product"""
+        if queryset is None:
+            queryset = self.all()
+        Order = apps.get_model('orders', 'Order')
+        return queryset.filter(Exists(Order.objects.filter(
+            user=OuterRef('user'),
+            items__product=OuterRef('product'),
+            status__in=VERIFIED_ORDER_STATUSES,
+        )))
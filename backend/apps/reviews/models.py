@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from apps.accounts.models import User
 from apps.products.models import Product
+from .managers import ProductReviewManager
 
 class ProductReview(models.Model):
     RATING_CHOICES = [
@@ -50,6 +51,8 @@ class ProductReview(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     approved_at = models.DateTimeField(null=True, blank=True)
 
+    objects = ProductReviewManager()
+
     class Meta:
         unique_together = ['product', 'user']
         ordering = ['-created_at', '-helpful_count']
@@ -57,11 +60,16 @@ class ProductReview(models.Model):
             models.Index(fields=['product', 'status']),
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['status', 'created_at']),
+            # Keyset pagination ordering for per-product review lists
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_id'),
         ]
 
     def __str__(self):
         return f"Review for {self.product.name} by {self.user.email}"
 
+    # Fields that affect the rating aggregates stored on Product
+    AGGREGATE_FIELDS = {'product', 'product_id', 'rating', 'is_approved', 'status'}
+
     def save(self, *args, **kwargs):
         # Auto-approve if rating is provided (you can modify this logic)
         if self.rating and not self.is_approved and self.status == 'pending':
@@ -69,7 +77,34 @@ class ProductReview(models.Model):
             self.status = 'approved'
             self.approved_at = timezone.now()
         
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not self.AGGREGATE_FIELDS.intersection(update_fields):
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = ProductReview.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values('product_id', 'rating', 'is_approved').first()
+
+            super().save(*args, **kwargs)
+            self.update_product_aggregates(previous)
+
+    def update_product_aggregates(self, previous=None):
+        """Apply the change between the previous and current state to Product aggregates"""
+        before = None
+        if previous and previous['is_approved']:
+            before = (previous['product_id'], previous['rating'])
+        after = (self.product_id, self.rating) if self.is_approved else None
+
+        if before == after:
+            return
+        if before:
+            Product.objects.adjust_rating_aggregates(*before, delta=-1)
+        if after:
+            Product.objects.adjust_rating_aggregates(*after, delta=1)
 
     @property
     def is_verified_purchase(self):
@@ -86,6 +121,8 @@ class ReviewImage(models.Model):
         related_name='images'
     )
     image = models.ImageField(upload_to='reviews/')
+    # Resized copies of `image`, see apps.core.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=200, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -1,15 +1,18 @@
 from rest_framework import serializers
 from django.core.validators import MinValueValidator, MaxValueValidator
 from .models import ProductReview, ReviewImage, ReviewHelpful, ReviewReport
+from apps.core.serializers import ImageDerivativesField, SparseFieldsetMixin
 from apps.products.serializers import ProductListSerializer
 
 class ReviewImageSerializer(serializers.ModelSerializer):
+    srcset = ImageDerivativesField('image')
+
     class Meta:
         model = ReviewImage
-        fields = ['id', 'image', 'alt_text', 'created_at']
+        fields = ['id', 'image', 'srcset', 'alt_text', 'created_at']
         read_only_fields = ['id', 'created_at']
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     product = ProductListSerializer(read_only=True)
     images = ReviewImageSerializer(many=True, read_only=True)
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.core import images
+from apps.orders.models import Order
+from apps.products import cache
+from apps.products.models import Product
+from .models import ProductReview, ReviewImage
+
+@receiver(post_delete, sender=ProductReview)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    """Remove a deleted approved review from the product rating aggregates"""
+    if instance.is_approved:
+        Product.objects.adjust_rating_aggregates(
+            instance.product_id, instance.rating, delta=-1
+        )
+
+@receiver(post_save, sender=Order)
+def invalidate_verified_review_stats(sender, instance, created, update_fields=None, **kwargs):
+    """Shipping, delivering or cancelling an order changes which reviews are verified"""
+    if created or (update_fields is not None and 'status' not in update_fields):
+        return
+    product_ids = instance.items.values_list('product_id', flat=True)
+    cache.bump(*(f'product:{pk}' for pk in product_ids))
+
+@receiver(post_save, sender=ReviewImage)
+def queue_review_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    """Render thumbnails and responsive widths of a new upload in the background"""
+    images.queue_derivatives(instance, 'image', update_fields)
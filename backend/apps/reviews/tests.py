@@ -1,3 +1,114 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.accounts.models import User
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from .models import ProductReview
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Blue T-Shirt', slug='blue-t-shirt', description='Cotton',
+            price=20, status='published'
+        )
+        self.alice = User.objects.create_user(email='alice@example.com', first_name='A', last_name='A')
+        self.bob = User.objects.create_user(email='bob@example.com', first_name='B', last_name='B')
+
+    def review(self, user, rating):
+        return ProductReview.objects.create(
+            product=self.product, user=user, rating=rating, title='t', comment='c'
+        )
+
+    def test_aggregates_follow_review_lifecycle(self):
+        first = self.review(self.alice, 5)
+        self.review(self.bob, 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.average_rating, 4)
+
+        first.rating = 4
+        first.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_distribution, {1: 0, 2: 0, 3: 1, 4: 1, 5: 0})
+
+        first.is_approved = False
+        first.status = 'rejected'
+        first.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+
+        ProductReview.objects.filter(user=self.bob).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+        self.assertEqual(self.product.rating_sum, 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        self.review(self.alice, 2)
+        Product.objects.filter(pk=self.product.pk).update(rating_count=9, rating_sum=40)
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+        self.assertEqual(self.product.rating_2_count, 1)
+        self.assertEqual(self.product.average_rating, 2)
+
+
+class ProductStatsTests(TestCase):
+    setUp = RatingAggregateTests.setUp
+    review = RatingAggregateTests.review
+
+    def order(self, user, status):
+        address = {
+            f'{kind}_{field}': 'x'
+            for kind in ('shipping', 'billing')
+            for field in ('first_name', 'last_name', 'address_line1', 'city', 'state', 'country', 'zip_code')
+        }
+        order = Order.objects.create(user=user, status=status, customer_email=user.email, **address)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, unit_price=20, total_price=20)
+        return order
+
+    def test_stats_come_from_one_query(self):
+        cache.clear()
+        self.review(self.alice, 5)
+        self.review(self.bob, 3)
+        self.order(self.alice, 'delivered')
+        bob_order = self.order(self.bob, 'processing')
+        url = reverse('product-stats', args=[self.product.slug])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['average_rating'], 4)
+        self.assertEqual(response.data['verified_review_count'], 1)
+        self.assertEqual(response.data['verified_review_share'], 0.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bob_order.status = 'shipped'
+            bob_order.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['verified_review_share'], 1)
+
+
+class ReviewSparseFieldsetTests(TestCase):
+    setUp = RatingAggregateTests.setUp
+    review = RatingAggregateTests.review
+
+    def test_nested_product_fields_skip_prefetches(self):
+        self.review(self.alice, 5)
+        self.review(self.bob, 4)
 
-# Create your tests here.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('reviews:reviews-list'), {'fields': 'id,rating,product.name', 'cursor': ''})
+        self.assertEqual(
+            response.data['results'],
+            [
+                {'id': review.pk, 'rating': review.rating, 'product': {'id': self.product.pk, 'name': 'Blue T-Shirt'}}
+                for review in ProductReview.objects.order_by('-created_at')
+            ]
+        )
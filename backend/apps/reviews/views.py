@@ -7,8 +7,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count, Q
+from django.db.models import Count, Exists, OuterRef, Q
 from django.shortcuts import get_object_or_404
+from apps.core.pagination import KeysetPagination
+from apps.core.serializers import is_field_requested
+from apps.orders.models import Order
+from apps.products.models import Product, primary_image_prefetch
+from .managers import VERIFIED_ORDER_STATUSES
 from .models import ProductReview, ReviewImage, ReviewHelpful, ReviewReport
 from .serializers import (
     ProductReviewSerializer, ProductReviewCreateSerializer,
@@ -18,6 +23,7 @@ from .serializers import (
 
 class ProductReviewViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['product', 'rating', 'status', 'is_approved', 'is_featured']
     search_fields = ['title', 'comment', 'product__name']
@@ -25,7 +31,14 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = ProductReview.objects.select_related('user', 'product').prefetch_related('images')
+        queryset = ProductReview.objects.select_related(
+            'user', 'product__category', 'product__brand'
+        )
+        # Skip prefetches for fields left out of ?fields=
+        if is_field_requested(self.request, 'images'):
+            queryset = queryset.prefetch_related('images')
+        if is_field_requested(self.request, 'product.primary_image'):
+            queryset = queryset.prefetch_related(primary_image_prefetch('product__images'))
         
         # For non-staff users, only show approved reviews
         if not self.request.user.is_staff:
@@ -123,7 +136,9 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_reviews(self, request):
         """Get current user's reviews"""
-        reviews = ProductReview.objects.filter(user=request.user)
+        reviews = ProductReview.objects.filter(user=request.user).select_related(
+            'product'
+        ).prefetch_related('images', primary_image_prefetch('product__images'))
         serializer = self.get_serializer(reviews, many=True)
         return Response(serializer.data)
 
@@ -138,15 +153,25 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Calculate statistics
+        product = get_object_or_404(Product, pk=product_id)
+        
+        # Rating totals come from the aggregates stored on Product
         reviews = ProductReview.objects.filter(product_id=product_id, is_approved=True)
+        verified_order = Order.objects.filter(
+            user=OuterRef('user'),
+            items__product=OuterRef('product'),
+            status__in=VERIFIED_ORDER_STATUSES
+        )
+        counts = reviews.aggregate(
+            verified_purchases=Count('id', filter=Q(Exists(verified_order))),
+            featured_reviews=Count('id', filter=Q(is_featured=True)),
+        )
         
         stats = {
-            'total_reviews': reviews.count(),
-            'average_rating': reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0,
-            'rating_distribution': reviews.values('rating').annotate(count=Count('id')).order_by('rating'),
-            'verified_purchases': reviews.filter(is_verified_purchase=True).count(),
-            'featured_reviews': reviews.filter(is_featured=True).count(),
+            'total_reviews': product.review_count,
+            'average_rating': product.average_rating,
+            'rating_distribution': product.rating_distribution,
+            **counts,
         }
         
         serializer = ProductReviewStatsSerializer(stats)
@@ -155,7 +180,9 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
 class AdminReviewViewSet(viewsets.ModelViewSet):
     """Admin-only viewset for review moderation"""
     permission_classes = [IsAdminUser]
-    queryset = ProductReview.objects.all()
+    queryset = ProductReview.objects.select_related(
+        'user', 'product'
+    ).prefetch_related('images', primary_image_prefetch('product__images'))
     serializer_class = ProductReviewSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['status', 'is_approved', 'is_featured', 'rating']
@@ -202,13 +229,13 @@ class AdminReviewViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Get pending reviews for moderation"""
-        pending_reviews = ProductReview.objects.filter(status='pending')
+        pending_reviews = self.get_queryset().filter(status='pending')
         serializer = self.get_serializer(pending_reviews, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def reported(self, request):
         """Get reported reviews for moderation"""
-        reported_reviews = ProductReview.objects.filter(reported_count__gt=0)
+        reported_reviews = self.get_queryset().filter(reported_count__gt=0)
         serializer = self.get_serializer(reported_reviews, many=True)
         return Response(serializer.data)
\ No newline at end of file
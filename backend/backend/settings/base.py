@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 import dj_database_url
+from celery.schedules import crontab
 
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -111,6 +112,7 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
         'user': '1000/hour',
+        'autocomplete': '120/minute',
     },
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -165,6 +167,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third party
     'rest_framework',
@@ -248,6 +251,64 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    # Catches stock alerts whose scheduled digest could not be queued
+    'stock-alert-digest': {
+        'task': 'apps.products.tasks.send_stock_alert_digest',
+        'schedule': 60 * 30,
+    },
+    # New orders hourly; a weekly rebuild drops cancelled orders and refreshes all scores
+    'related-products': {
+        'task': 'apps.products.tasks.update_related_products',
+        'schedule': 60 * 60,
+    },
+    'related-products-rebuild': {
+        'task': 'apps.products.tasks.update_related_products',
+        'schedule': crontab(minute=30, hour=3, day_of_week='sunday'),
+        'kwargs': {'full': True},
+    },
+    'product-flags': {
+        'task': 'apps.products.tasks.update_product_flags',
+        'schedule': 60 * 60,
+    },
+    'product-views-flush': {
+        'task': 'apps.products.tasks.flush_product_views',
+        'schedule': 60,
+    },
+    # Drops the day that left the popularity window
+    'product-popularity': {
+        'task': 'apps.products.tasks.recompute_product_popularity',
+        'schedule': crontab(minute=5, hour=0),
+    },
+}
+
+# Automatic merchandising flags (apps.products.flags)
+BESTSELLERS_PER_CATEGORY = int(os.environ.get('BESTSELLERS_PER_CATEGORY', 10))
+NEW_ARRIVAL_DAYS = int(os.environ.get('NEW_ARRIVAL_DAYS', 30))
+
+# Comma-separated addresses for low stock digests (default: active superusers)
+STOCK_ALERT_RECIPIENTS = [
+    address.strip()
+    for address in os.environ.get('STOCK_ALERT_RECIPIENTS', '').split(',')
+    if address.strip()
+]
+
+# Catalog response cache and product view counters; shared through Redis when it is configured
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'nexus',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 # Conditionally add debug_toolbar only in development
 if DEBUG:
     INSTALLED_APPS.append('debug_toolbar')